@@ -3,8 +3,14 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import numpy as np
+import json
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
 from st_aggrid import AgGrid, GridOptionsBuilder, JsCode
 
+from utils.holdings_store import STORE_PATH, HoldingsStore, find_snapshots, parse_holders_csv
+
 #########################################
 # Helper Functions
 #########################################
@@ -23,27 +29,36 @@ def abbreviate_number_py(num):
     else:
         return f"{num:.0f}"
 
-def convert_shares_to_millions(share_str):
+# Versión del formato del parquet convertido; subirla si cambia el parseo
+CSV_CACHE_VERSION = 1
+CSV_CACHE_METADATA_KEY = b'institucionales_csv'
+
+def _csv_cache_key(csv_path):
+    return {'version': CSV_CACHE_VERSION, 'source_mtime_ns': os.stat(csv_path).st_mtime_ns}
+
+def load_and_prepare_data(csv_path):
     """
-    Converts a share string to numeric value in millions.
+    Devuelve el CSV ya convertido. La conversión se guarda en `<csv>.parquet` junto con
+    el mtime del CSV; mientras el CSV no cambie, se lee el parquet sin reparsear texto.
     """
-    if isinstance(share_str, (int, float)):
-        return share_str
-    share_str = share_str.strip()
-    if 'B' in share_str:
-        return float(share_str.replace('B', '')) * 1000
-    elif 'M' in share_str:
-        return float(share_str.replace('M', ''))
-    elif 'k' in share_str:
-        return float(share_str.replace('k', '')) / 1000
-    else:
-        return float(share_str)
+    cache_path = f"{csv_path}.parquet"
+    key = _csv_cache_key(csv_path)
+    if os.path.exists(cache_path):
+        metadata = pq.read_schema(cache_path).metadata or {}
+        if metadata.get(CSV_CACHE_METADATA_KEY) == json.dumps(key).encode():
+            return pq.read_table(cache_path).to_pandas()
 
-def load_and_prepare_data():
-    df = pd.read_csv('institutional_holders_all_20250205_215655.csv')
-    df['Shares'] = df['Shares'].apply(convert_shares_to_millions)
-    df['% Out'] = df['% Out'].str.replace('%', '').astype(float)
-    df['Value'] = pd.to_numeric(df['Value'], errors='coerce')
+    df = parse_holders_csv(csv_path)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[CSV_CACHE_METADATA_KEY] = json.dumps(key).encode()
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        pq.write_table(table.replace_schema_metadata(schema_metadata), tmp_path)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Sin permisos de escritura: se sigue con el frame en memoria
+        pass
     return df
 
 def create_heatmap(df, selected_holders):
@@ -74,18 +89,76 @@ def create_heatmap(df, selected_holders):
     )
     return fig
 
-def calculate_concentration_metrics(holder_data):
-    total_value = holder_data['Value'].sum()
-    sorted_positions = holder_data.sort_values('Value', ascending=False)
+def compute_holder_metrics(df):
+    """
+    Métricas de concentración de todas las instituciones en una sola pasada agrupada:
+    número de posiciones, valor total, Top 5/Top 10 (% del valor), HHI y posiciones >5%/>10% de % Out.
+    """
+    # Orden único por (Holder, Value desc): el rango dentro de cada institución define el Top N
+    ordered = df.sort_values(['Holder', 'Value'], ascending=[True, False], kind='mergesort')
+    rank = ordered.groupby('Holder', sort=False).cumcount()
+    value = ordered['Value'].astype(float)
+    pct_out = ordered['% Out']
+    grouped = pd.DataFrame({
+        'Holder': ordered['Holder'],
+        'Número de Posiciones': 1,
+        'Valor Total': value,
+        'Top 5': value.where(rank < 5),
+        'Top 10': value.where(rank < 10),
+        'Valor²': value ** 2,
+        '% Out': pct_out,
+        'Posiciones >5%': (pct_out > 5).astype(int),
+        'Posiciones >10%': (pct_out > 10).astype(int),
+    }).groupby('Holder', sort=True).agg({
+        'Número de Posiciones': 'sum',
+        'Valor Total': 'sum',
+        'Top 5': 'sum',
+        'Top 10': 'sum',
+        'Valor²': 'sum',
+        '% Out': 'mean',
+        'Posiciones >5%': 'sum',
+        'Posiciones >10%': 'sum',
+    })
+
+    total = grouped['Valor Total']
+    return pd.DataFrame({
+        'Número de Posiciones': grouped['Número de Posiciones'],
+        'Valor Total': total,
+        '% Promedio Out': grouped['% Out'],
+        'Top 5 Concentración': grouped['Top 5'] / total * 100,
+        'Top 10 Concentración': grouped['Top 10'] / total * 100,
+        # HHI = Σ (Value / total * 100)² = 10⁴ · Σ Value² / total²
+        'HHI': grouped['Valor²'] / total ** 2 * 10_000,
+        'Posiciones >5%': grouped['Posiciones >5%'],
+        'Posiciones >10%': grouped['Posiciones >10%'],
+    })
+
+def calculate_concentration_metrics(holder_metrics, holder):
+    row = holder_metrics.loc[holder]
     metrics = {
-        'Top 5 Concentración': f"{(sorted_positions['Value'].head(5).sum() / total_value * 100):.2f}%",
-        'Top 10 Concentración': f"{(sorted_positions['Value'].head(10).sum() / total_value * 100):.2f}%",
-        'HHI': f"{((holder_data['Value'] / total_value * 100) ** 2).sum():.2f}",
-        'Posiciones >5%': len(holder_data[holder_data['% Out'] > 5]),
-        'Posiciones >10%': len(holder_data[holder_data['% Out'] > 10])
+        'Top 5 Concentración': f"{row['Top 5 Concentración']:.2f}%",
+        'Top 10 Concentración': f"{row['Top 10 Concentración']:.2f}%",
+        'HHI': f"{row['HHI']:.2f}",
+        'Posiciones >5%': int(row['Posiciones >5%']),
+        'Posiciones >10%': int(row['Posiciones >10%'])
     }
     return metrics
 
+@st.cache_data
+def load_app_data(csv_path, source_mtime_ns):
+    """
+    Carga el CSV y precalcula las métricas por institución una sola vez por versión
+    del archivo (`source_mtime_ns` forma parte de la clave del caché).
+    """
+    df = load_and_prepare_data(csv_path)
+    return df, compute_holder_metrics(df)
+
+@st.cache_data
+def load_store_data(store_path, as_of, store_version):
+    """Cartera de cada Holder según su último reporte al `as_of` (desde el histórico), con sus métricas."""
+    df = HoldingsStore(store_path).latest_as_of(as_of)
+    return df, compute_holder_metrics(df)
+
 #########################################
 # Main App
 #########################################
@@ -99,8 +172,20 @@ def main():
     """, unsafe_allow_html=True)
     st.title("Análisis de Tenencias Institucionales")
 
-    df = load_and_prepare_data()
-    holders = sorted(df['Holder'].unique())
+    # 🔹 Histórico de exportaciones (ver ingest_snapshots.py); si no existe, la última exportación CSV
+    store = HoldingsStore(STORE_PATH)
+    report_dates = store.report_dates()
+    if report_dates:
+        as_of = st.sidebar.selectbox("Datos al", report_dates[::-1], format_func=lambda d: d.strftime('%Y-%m-%d'))
+        df, holder_metrics = load_store_data(STORE_PATH, as_of, store.version())
+    else:
+        snapshots = find_snapshots()
+        if not snapshots:
+            st.error("No se encontraron exportaciones 'institutional_holders_all_*.csv' ni el histórico.")
+            st.stop()
+        csv_path = snapshots[-1]
+        df, holder_metrics = load_app_data(csv_path, os.stat(csv_path).st_mtime_ns)
+    holders = list(holder_metrics.index)
     tickers = sorted(df['Ticker'].unique())
 
     tab1, tab2, tab3, tab4 = st.tabs([
@@ -118,15 +203,16 @@ def main():
 
         st.header(f"Análisis de Tenencias para {selected_holder}")
         col1, col2, col3 = st.columns(3)
+        holder_row = holder_metrics.loc[selected_holder]
         with col1:
-            st.metric("Número de Posiciones", len(holder_data))
+            st.metric("Número de Posiciones", int(holder_row['Número de Posiciones']))
         with col2:
-            st.metric("% Promedio de Acciones en Circulación", f"{holder_data['% Out'].mean():.2f}%")
+            st.metric("% Promedio de Acciones en Circulación", f"{holder_row['% Promedio Out']:.2f}%")
         with col3:
-            st.metric("Valor Total", f"${holder_data['Value'].sum():,.0f}")
+            st.metric("Valor Total", f"${holder_row['Valor Total']:,.0f}")
 
         st.subheader("Métricas de Concentración")
-        metrics = calculate_concentration_metrics(holder_data)
+        metrics = calculate_concentration_metrics(holder_metrics, selected_holder)
         for metric_name, value in metrics.items():
             st.write(f"**{metric_name}:** {value}")
 
@@ -164,7 +250,7 @@ def main():
             'Acciones (M)': holder_data_sorted['Shares'],
             '% de Acciones en Circulación': holder_data_sorted['% Out'],
             'Valor ($)': holder_data_sorted['Value'],
-            'Fecha Reportada': holder_data_sorted['Date Reported']
+            'Fecha Reportada': holder_data_sorted['Date Reported'].dt.strftime('%b %d, %Y')
         })
 
         # Build AgGrid options with custom renderers
@@ -243,10 +329,7 @@ def main():
     #### Tab 3: Ranking Institucional ####
     with tab3:
         st.header("Ranking de Instituciones")
-        inst_metrics = df.groupby('Holder').agg({
-            'Ticker': 'count',
-            'Value': 'sum'
-        }).reset_index()
+        inst_metrics = holder_metrics[['Número de Posiciones', 'Valor Total']].rename_axis('Institución').reset_index()
         inst_metrics.columns = ['Institución', 'Número de Empresas', 'Valor Total']
         inst_metrics['Tamaño Promedio de Posición'] = inst_metrics['Valor Total'] / inst_metrics['Número de Empresas']
 
@@ -332,6 +415,19 @@ def main():
             help="Descarga el ranking completo en CSV"
         )
 
+        st.subheader("Ranking por Concentración")
+        concentration_metric = st.selectbox(
+            "Ordenar instituciones por:",
+            ['HHI', 'Top 5 Concentración', 'Top 10 Concentración', 'Posiciones >5%', 'Posiciones >10%'])
+        concentration_ranking = holder_metrics.sort_values(concentration_metric, ascending=False).rename_axis('Institución')
+        st.dataframe(concentration_ranking.style.format({
+            'Valor Total': '${:,.0f}',
+            '% Promedio Out': '{:.2f}%',
+            'Top 5 Concentración': '{:.2f}%',
+            'Top 10 Concentración': '{:.2f}%',
+            'HHI': '{:.2f}',
+        }))
+
     #### Tab 4: Análisis por Ticker ####
     with tab4:
         st.header("Análisis por Ticker")
@@ -362,7 +458,7 @@ def main():
             'Acciones (M)': ticker_data['Shares'],
             '% de Acciones en Circulación': ticker_data['% Out'],
             'Valor ($)': ticker_data['Value'],
-            'Fecha Reportada': ticker_data['Date Reported']
+            'Fecha Reportada': ticker_data['Date Reported'].dt.strftime('%b %d, %Y')
         })
         gb_ticker = GridOptionsBuilder.from_dataframe(ticker_display_df)
         gb_ticker.configure_column("Valor ($)", cellRenderer=renderer_value, sortable=True)
@@ -2,11 +2,16 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import yfinance as yf
 import numpy as np
 import math
 import matplotlib.pyplot as plt
 from matplotlib_venn import venn2, venn3
+import os
+
+from utils.holdings_cube import HoldingsCube
+from utils.reference_data import reference_data
+
+DATA_FILES = ["institutional_holders.parquet", "general_data.parquet"]
 
 # --- Data Loading and Caching ---
 @st.cache_data
@@ -15,24 +20,22 @@ def load_data():
     general_data = pd.read_parquet("general_data.parquet", engine="pyarrow")
     return institutional_holders, general_data
 
+@st.cache_resource
+def get_holdings_cube(_merged_data, data_version, selected_date):
+    """
+    Cubo fecha × tenedor × ticker para las secciones de cartera y sentimiento, armado
+    con `_merged_data` ya filtrado por `selected_date`; se reconstruye cuando cambian
+    los parquet (`data_version`) o la fecha elegida.
+    """
+    return HoldingsCube(_merged_data)
+
 @st.cache_data
 def get_market_caps(tickers_list):
     """
-    Fetches current market capitalization for a list of tickers using yfinance.
-    Includes error handling for tickers that might fail.
+    Fetches current market capitalization for a list of tickers through the shared
+    reference-data cache (only stale or missing tickers hit yfinance).
     """
-    market_caps = {}
-    for ticker in tickers_list:
-        try:
-            stock = yf.Ticker(ticker)
-            # Use 'marketCap' as it's the most common key for market capitalization
-            cap = stock.info.get('marketCap', None)
-            if cap:
-                market_caps[ticker] = cap
-        except Exception:
-            # Silently fail for tickers that can't be found
-            pass
-    return market_caps
+    return reference_data.values(tickers_list, "Market Cap")
 
 # --- Main App Logic ---
 institutional_holders, general_data = load_data()
@@ -45,6 +48,8 @@ general_data["Price per Share"] = (general_data["Total Holdings Value"] * 1e6) /
 with st.spinner('Obteniendo datos de capitalización de mercado en tiempo real...'):
     unique_tickers = general_data['Ticker'].unique()
     live_market_caps = get_market_caps(unique_tickers)
+    # Keep prices warm in the background so the price lookups below never wait on yfinance
+    reference_data.start_prefetch(unique_tickers)
 
     if live_market_caps:
         market_cap_df = pd.DataFrame(list(live_market_caps.items()), columns=['Ticker', 'Market Cap'])
@@ -870,15 +875,17 @@ elif option == "Análisis Adicional":
         ticker_data = merged_data[merged_data['Ticker'] == ticker]
         total_shares = general_data[general_data['Ticker'] == ticker]['Total Shares Outstanding'].iloc[0] * 1e6
 
-        # Use yfinance to get current stock price
-        try:
-            stock = yf.Ticker(ticker)
-            price = stock.info['regularMarketPrice']
+        # Current price from the reference-data cache (no network call while rendering)
+        quote = reference_data.lookup(ticker, "Price")
+        price = quote.value
+        if price is not None:
             market_cap = price * total_shares
             st.write(f"Precio actual de {ticker}: ${price:.2f}")
             st.write(f"Capitalización de Mercado de {ticker}: ${market_cap / 1e6:.2f} millones")
-        except Exception as e:
-            st.warning(f"No se pudo obtener el precio actual para {ticker} desde yfinance. Error: {e}")
+            if quote.stale:
+                st.caption(f"Precio del {quote.fetched_at:%Y-%m-%d %H:%M} UTC; se está actualizando en segundo plano.")
+        else:
+            st.warning(f"Todavía no hay un precio en cache para {ticker}; se está obteniendo en segundo plano.")
             st.info(
                 f"Usando precio aproximado de los datos cargados: ${general_data[general_data['Ticker'] == ticker]['Price per Share'].iloc[0]:.2f}")
             price = general_data[general_data['Ticker'] == ticker]['Price per Share'].iloc[0]
@@ -988,15 +995,15 @@ elif option == "Análisis Adicional":
     st.dataframe(styled_df)
 
     # 9. Portfolio Analysis for Holders
+    cube = get_holdings_cube(merged_data, tuple(os.path.getmtime(path) for path in DATA_FILES), selected_date)
     st.subheader("Análisis de Cartera para Tenedores")
-    holder_port_list = sorted(institutional_holders['Owner Name'].unique())
+    holder_port_list = list(cube.holders)
     holder = st.selectbox("Selecciona un Tenedor para análisis de diversificación:", holder_port_list)
     if holder:
-        holder_portfolio = merged_data[merged_data['Owner Name'] == holder]
         st.write(f"### Diversificación de {holder}")
-        st.write(f"Número de Tickers Únicos: {holder_portfolio['Ticker'].nunique()}")
+        st.write(f"Número de Tickers Únicos: {cube.holder_ticker_count(holder)}")
 
-        total_holdings_value = holder_portfolio['Individual Holdings Value'].sum()
+        total_holdings_value = cube.holder_total(holder, 'Individual Holdings Value')
 
         if total_holdings_value >= 1e3:
             formatted_value = f"${total_holdings_value / 1e3:.2f} mil millones"
@@ -1007,28 +1014,29 @@ elif option == "Análisis Adicional":
 
     # 10. Sentiment Indicator
     st.subheader("Indicador de Sentimiento a través de Tenencias")
-    holder_sent_list = sorted(institutional_holders['Owner Name'].unique())
+    holder_sent_list = list(cube.holders)
     holder = st.selectbox("Selecciona un Tenedor para análisis de sentimiento:", holder_sent_list)
     if holder:
-        holder_sentiment = merged_data[merged_data['Owner Name'] == holder].sort_values('Date')
+        active_dates = cube.holder_active_dates(holder)
+        holder_change = cube.holder_trend(holder, 'Shares Change')[active_dates]
         fig = go.Figure()
-        fig.add_trace(go.Scatter(x=holder_sentiment['Date'], y=holder_sentiment['Shares Change'],
+        fig.add_trace(go.Scatter(x=holder_change.index, y=holder_change.values,
                                  mode='lines+markers',
                                  marker=dict(
-                                     color=['green' if x > 0 else 'red' for x in holder_sentiment['Shares Change']])))
+                                     color=['green' if x > 0 else 'red' for x in holder_change.values])))
         fig.update_layout(title=f'Sentimiento de {holder} a través de Cambios en Tenencias', xaxis_title='Fecha',
                           yaxis_title='Cambio en Acciones')
         st.plotly_chart(fig)
 
         # New: Sentiment with % change
         st.subheader("Indicador de Sentimiento a través de Cambios % en Tenencias")
-        holder_sentiment_noinf = holder_sentiment[~np.isinf(holder_sentiment['Shares Change % num'])]
+        holder_change_pct = cube.holder_change_pct_trend(holder)[active_dates].dropna()
         fig_percent = go.Figure()
         fig_percent.add_trace(
-            go.Scatter(x=holder_sentiment_noinf['Date'], y=holder_sentiment_noinf['Shares Change % num'],
+            go.Scatter(x=holder_change_pct.index, y=holder_change_pct.values,
                        mode='lines+markers',
                        marker=dict(
-                           color=['green' if x > 0 else 'red' for x in holder_sentiment_noinf['Shares Change % num']])))
+                           color=['green' if x > 0 else 'red' for x in holder_change_pct.values])))
         fig_percent.update_layout(title=f'Sentimiento de {holder} a través de Cambios % en Tenencias',
                                   xaxis_title='Fecha', yaxis_title='Cambio en Acciones %')
         st.plotly_chart(fig_percent)
\ No newline at end of file
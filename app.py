@@ -1,49 +1,47 @@
 import streamlit as st
 import pandas as pd
-from utils.data_processing import load_data, get_market_caps, preprocess_data
+from utils.dataset import get_dataset, refresh_dataset
 
 st.set_page_config(page_title="Análisis de Tenencias Institucionales", layout="wide")
 st.header("POR FAVOR ESPERAR A QUE SE CARGUEN LOS DATOS Y SE DIGA QUE SE CARGARON CON ÉXITO!!!")
-# Initialize session state for data
-if 'merged_data' not in st.session_state:
-    try:
-        with st.spinner('Cargando datos...'):
-            institutional_holders, general_data = load_data()
-            if institutional_holders.empty or general_data.empty:
-                raise ValueError("Uno o ambos archivos parquet están vacíos.")
-            live_market_caps = get_market_caps(general_data['Ticker'].unique())
-            merged_data, merged_data_display = preprocess_data(institutional_holders, general_data, live_market_caps)
-            st.session_state.merged_data = merged_data
-            st.session_state.merged_data_display = merged_data_display
-            st.session_state.unique_dates = sorted(merged_data['Date'].dt.date.unique())
-            st.success("Datos cargados con éxito.")
-    except FileNotFoundError as e:
-        st.error(f"Error: No se encontraron los archivos parquet. Asegúrate de que 'institutional_holders.parquet' y 'general_data.parquet' estén en el directorio raíz. Detalles: {str(e)}")
-        st.stop()
-    except Exception as e:
-        st.error(f"Error al cargar los datos: {str(e)}")
-        st.stop()
-# Función para limpiar cache
-def clear_preprocess_cache():
-    """Borra forzosamente el cache de preprocess_data."""
-    preprocess_data.clear()
-    st.success("Cache de datos forzadamente borrado. Los datos se regenerarán al recargar.")
+# Load the process-wide dataset (shared by every page and session)
+try:
+    with st.spinner('Cargando datos...'):
+        dataset = get_dataset()
+        st.success("Datos cargados con éxito.")
+except FileNotFoundError as e:
+    st.error(f"Error: No se encontraron los archivos parquet. Asegúrate de que 'institutional_holders.parquet' y 'general_data.parquet' estén en el directorio raíz. Detalles: {str(e)}")
+    st.stop()
+except Exception as e:
+    st.error(f"Error al cargar los datos: {str(e)}")
+    st.stop()
+# Regenera solo lo que cambió (market caps o filas nuevas); la reconstrucción completa es opcional
+def regenerate_data(full):
+    """Regenera el dataset compartido y muestra qué se recalculó."""
+    with st.spinner('Regenerando datos...'):
+        result = refresh_dataset(full=full)
+    if result["mode"] == "none":
+        st.info("No hubo cambios en los datos de origen ni en los market caps.")
+    elif result["mode"] == "incremental":
+        st.success(
+            f"Datos actualizados: market cap de {result['market_cap_tickers']} tickers "
+            f"({result['market_cap_rows']} filas) y {result['new_rows']} filas nuevas."
+        )
+    else:
+        st.success("Datos reconstruidos por completo.")
 
-# Botón para limpiar cache
+full_rebuild = st.checkbox("Reconstrucción completa", value=False)
+# Botón para regenerar datos
 if st.button("Regenerar datos"):
-    clear_preprocess_cache()
+    regenerate_data(full_rebuild)
 # Global date filter
-try:
-    st.sidebar.header("Filtro por Fecha")
-    selected_date = st.sidebar.selectbox(
-        "Selecciona una Fecha (opcional):",
-        [None] + st.session_state.unique_dates,
-        key='global_date_filter'
-    )
-    st.session_state.selected_date = pd.to_datetime(selected_date) if selected_date else None
-except KeyError:
-    st.error("No se pudieron cargar las fechas únicas. Los datos no están inicializados correctamente.")
-    st.stop()
+st.sidebar.header("Filtro por Fecha")
+selected_date = st.sidebar.selectbox(
+    "Selecciona una Fecha (opcional):",
+    [None] + dataset.unique_dates,
+    key='global_date_filter'
+)
+st.session_state.selected_date = pd.to_datetime(selected_date) if selected_date else None
 
 st.title("Análisis de Tenencias Institucionales")
-st.write("Selecciona una página desde la barra lateral para continuar.")
\ No newline at end of file
+st.write("Selecciona una página desde la barra lateral para continuar.")
@@ -0,0 +1,229 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from utils.crowding import compute_crowding
+from utils.data_processing import (
+    GENERAL_DATA_PATH,
+    HOLDERS_PATH,
+    aggregate_by_sector_industry,
+    build_merged_data,
+    derive_position_columns,
+    load_data,
+    prepare_general_data,
+)
+from utils.dataset import Dataset
+from utils.flows import aggregate_flows
+from utils.holdings_cube import HoldingsCube
+from utils.overlap import jaccard_matrix, overlap_regions
+from utils.ownership_index import OwnershipIndex
+from utils.plotting import (
+    plot_holders_heatmap,
+    plot_jaccard_heatmap,
+    plot_market_concentration,
+    plot_sector_industry,
+    plot_top_20,
+    plot_upset,
+)
+from utils.quote_providers import ReplayProvider
+from utils.ranking import top_bottom_k
+from utils.reference_data import ReferenceData
+from utils.similarity import HolderSimilarity
+
+BENCH_OUTPUT = "bench_output.txt"
+DEFAULT_SCALES = [1, 10]  # 100× necesita más de 5 GB: agregarlo a mano con --scales 1,10,100
+OVERLAP_ITEMS = 5  # tickers comparados en la etapa de coincidencias
+
+
+def synthesize(holders, general_data, scale, seed=0):
+    """
+    Universo `scale` veces más grande: copias de los tickers (AAPL, AAPL~2, …) con los
+    mismos tenedores y fechas y acciones/valores perturbados, así se mantienen las
+    distribuciones del archivo real (tenedores por ticker, fechas, sectores).
+    """
+    rng = np.random.default_rng(seed)
+    copies = max(1, int(scale))
+    n_rows = len(holders)
+
+    # 🔹 Tickers como categorías: el código de la copia k es código_base + k · n_tickers
+    base = pd.Index(pd.unique(pd.concat([general_data["Ticker"], holders["Ticker"]]).astype(str)))
+    names = [t if k == 0 else f"{t}~{k + 1}" for k in range(copies) for t in base]
+    copy_ids = np.repeat(np.arange(copies), n_rows)
+    codes = np.tile(base.get_indexer(holders["Ticker"].astype(str)), copies) + copy_ids * len(base)
+    factor = rng.lognormal(0.0, 0.1, n_rows * copies)
+    synthetic_holders = pd.DataFrame({
+        "Ticker": pd.Categorical.from_codes(codes, names).astype(str),
+        "Owner Name": np.tile(holders["Owner Name"].to_numpy(dtype=object), copies),
+        "Date": np.tile(holders["Date"].to_numpy(), copies),
+        "Shares Held": np.round(np.tile(holders["Shares Held"].to_numpy(dtype=np.float64), copies) * factor),
+        "Shares Change": np.round(np.tile(holders["Shares Change"].to_numpy(dtype=np.float64), copies) * factor),
+    })
+
+    general_codes = np.tile(base.get_indexer(general_data["Ticker"].astype(str)), copies) \
+        + np.repeat(np.arange(copies), len(general_data)) * len(base)
+    synthetic_general = pd.concat([general_data] * copies, ignore_index=True)
+    synthetic_general["Ticker"] = np.asarray(names, dtype=object)[general_codes]
+    for col in ["Total Shares Outstanding", "Total Holdings Value"]:
+        synthetic_general[col] = synthetic_general[col] * rng.lognormal(0.0, 0.1, len(synthetic_general))
+    return synthetic_holders, synthetic_general
+
+
+def write_replay_responses(general_data, path):
+    """Respuestas de quotes sintéticas (market cap ≈ precio aproximado × acciones) para ReplayProvider."""
+    price = general_data["Total Holdings Value"] / (
+        general_data["Total Shares Outstanding"] * general_data["Institutional Ownership %"]
+    )
+    market_cap = price * general_data["Total Shares Outstanding"] * 1e6
+    responses = {
+        ticker: {"marketCap": float(cap), "regularMarketPrice": float(p)}
+        for ticker, cap, p in zip(general_data["Ticker"], market_cap, price)
+        if np.isfinite(cap) and np.isfinite(p)
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(responses, f)
+
+
+class StageTimer:
+    """Mide tiempo y (opcionalmente) pico de memoria de cada etapa con tracemalloc."""
+
+    def __init__(self, track_memory=True):
+        self.track_memory = track_memory
+        self.results = []
+
+    def measure(self, scale, stage, fn):
+        gc.collect()
+        if self.track_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] / 1e6 if self.track_memory else np.nan
+        if self.track_memory:
+            tracemalloc.stop()
+        self.results.append({"Escala": scale, "Etapa": stage, "Segundos": elapsed, "Pico MB": peak})
+        print(f"  {stage:<45} {elapsed:8.3f} s" + (f"  {peak:10.1f} MB" if self.track_memory else ""))
+        return result
+
+
+def warm_up():
+    """Primer gráfico fuera de la medición: plotly carga plantillas y validadores de forma perezosa."""
+    plot_upset(pd.DataFrame({"Máscara": [1], "Combinación": ["A"], "Grado": [1], "Cantidad": [1]}), ["A"], "Tenedores")
+
+
+def run_scale(scale, holders, general_data, timer, workdir):
+    """Genera el dataset de la escala dada y corre todas las etapas sobre él."""
+    print(f"\n=== Escala {scale}× ===")
+    synthetic_holders, synthetic_general = synthesize(holders, general_data, scale)
+    holders_path = os.path.join(workdir, f"holders_{scale}x.parquet")
+    general_path = os.path.join(workdir, f"general_{scale}x.parquet")
+    synthetic_holders.to_parquet(holders_path, index=False)
+    synthetic_general.to_parquet(general_path, index=False)
+    responses_path = os.path.join(workdir, f"quotes_{scale}x.json")
+    write_replay_responses(synthetic_general, responses_path)
+    print(f"  {len(synthetic_holders):,} filas, {len(synthetic_general):,} tickers")
+    del synthetic_holders, synthetic_general
+
+    # 🔹 Carga, market caps (sin red) y preprocesamiento
+    ih, gd = timer.measure(scale, "load_data", lambda: load_data(holders_path, general_path))
+    reference = ReferenceData(os.path.join(workdir, f"reference_{scale}x.parquet"),
+                              provider=ReplayProvider(responses_path))
+    live_market_caps = timer.measure(scale, "market caps (replay)",
+                                     lambda: reference.values(gd["Ticker"].unique(), "Market Cap"))
+    timer.measure(scale, "prepare_general_data", lambda: prepare_general_data(gd, live_market_caps))
+    merged = timer.measure(scale, "build_merged_data (merge + derive)",
+                           lambda: build_merged_data(ih, gd, live_market_caps))
+    frame = merged.copy()
+    timer.measure(scale, "derive_position_columns", lambda: derive_position_columns(frame))
+    del frame, ih
+    dataset = timer.measure(scale, "Dataset (rangos por fecha)", lambda: Dataset(merged))
+    dates = sorted(dataset.date_slices)
+
+    # 🔹 Agregaciones de las páginas
+    flows = timer.measure(scale, "flows (market_rankings)", lambda: aggregate_flows(merged))
+    timer.measure(scale, "top/bottom net_value (market_rankings)", lambda: top_bottom_k(flows, "net_value"))
+    if len(dates) >= 2:
+        timer.measure(scale, "diff entre fechas (market_rankings)",
+                      lambda: aggregate_flows(dataset.diff(dates[-2], dates[-1])))
+    sector_stats = timer.measure(scale, "sector/industria (sectors)",
+                                 lambda: aggregate_by_sector_industry(merged, "Sector"))
+    index = timer.measure(scale, "OwnershipIndex (comparison)", lambda: OwnershipIndex(merged))
+    timer.measure(scale, "commonality (commonality)", lambda: index.commonality("Ticker"))
+    items = list(merged.groupby("Ticker", observed=True).size().nlargest(OVERLAP_ITEMS).index.astype(str))
+    regions = timer.measure(scale, "overlap_regions (comparison)", lambda: overlap_regions(index, items, "Ticker"))
+    jaccard = timer.measure(scale, "jaccard_matrix (comparison)", lambda: jaccard_matrix(index, items, "Ticker"))
+    timer.measure(scale, "HolderSimilarity última fecha (commonality)",
+                  lambda: HolderSimilarity(dataset.for_date(dates[-1])))
+    timer.measure(scale, "crowding (crowding_rankings)", lambda: compute_crowding(merged))
+    timer.measure(scale, "HoldingsCube (additional_analysis)", lambda: HoldingsCube(merged))
+
+    # 🔹 Construcción de figuras (st.plotly_chart no hace nada fuera de streamlit run)
+    timer.measure(scale, "figura plot_top_20", lambda: plot_top_20(flows, "Ticker", "net_value", "Top", "blue"))
+    timer.measure(scale, "figura plot_sector_industry",
+                  lambda: plot_sector_industry(sector_stats.reset_index(), "Sector"))
+    timer.measure(scale, "figura plot_market_concentration", lambda: plot_market_concentration(merged, "Sector"))
+    timer.measure(scale, "figura plot_holders_heatmap", lambda: plot_holders_heatmap(merged, "Sector"))
+    timer.measure(scale, "figura plot_upset", lambda: plot_upset(regions, items, "Tenedores"))
+    timer.measure(scale, "figura plot_jaccard_heatmap", lambda: plot_jaccard_heatmap(jaccard, "Jaccard"))
+
+
+def summarize(results, scales):
+    """Tablas Etapa × Escala de segundos, pico de memoria y crecimiento relativo al lineal."""
+    df = pd.DataFrame(results)
+    stages = list(dict.fromkeys(df["Etapa"]))
+    seconds = df.pivot(index="Etapa", columns="Escala", values="Segundos").reindex(stages)
+    peak = df.pivot(index="Etapa", columns="Escala", values="Pico MB").reindex(stages)
+    # Tiempo relativo a la escala más chica dividido por el factor de escala: ~1 es lineal, >>1 es un quiebre
+    base = scales[0]
+    growth = seconds.div(seconds[base], axis=0).div(pd.Series(scales, index=scales) / base, axis=1)
+    return seconds, peak, growth
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Mide tiempo y pico de memoria de cada etapa del pipeline sobre datos sintéticos escalados."
+    )
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="Factores de escala respecto de institutional_holders.parquet (por defecto 1,10; "
+                             "100 es opcional y necesita más de 5 GB de memoria)")
+    parser.add_argument("--holders", default=HOLDERS_PATH)
+    parser.add_argument("--general-data", default=GENERAL_DATA_PATH)
+    parser.add_argument("--output", default=BENCH_OUTPUT, help="Archivo donde se guarda el reporte")
+    parser.add_argument("--no-memory", action="store_true",
+                        help="No medir memoria (tracemalloc agrega overhead a los tiempos)")
+    args = parser.parse_args()
+
+    # Sin `streamlit run` las llamadas st.* solo emiten advertencias
+    logging.getLogger("streamlit").setLevel(logging.ERROR)
+    scales = sorted(int(s) for s in args.scales.split(","))
+    holders = pd.read_parquet(args.holders)
+    general_data = pd.read_parquet(args.general_data)
+    timer = StageTimer(track_memory=not args.no_memory)
+    warm_up()
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as workdir:
+        for scale in scales:
+            run_scale(scale, holders, general_data, timer, workdir)
+            gc.collect()
+
+    seconds, peak, growth = summarize(timer.results, scales)
+    sections = [f"=== Segundos por etapa ({len(holders):,} filas = 1×) ===\n" + seconds.round(3).to_string()]
+    if timer.track_memory:
+        sections.append("=== Pico de memoria (MB, tracemalloc) ===\n" + peak.round(1).to_string())
+    sections.append("=== Crecimiento vs. lineal (1 = lineal, > 1 peor que lineal) ===\n" + growth.round(2).to_string())
+    report = "\n\n".join(sections)
+    print("\n" + report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(report + "\n")
+    print(f"\n✅ Reporte guardado en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
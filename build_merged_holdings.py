@@ -0,0 +1,27 @@
+import argparse
+
+from utils.data_processing import memory_report
+from utils.etl import MERGED_HOLDINGS_PATH, build_merged_holdings
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Materializa el frame combinado (holders + general data + columnas derivadas) en un parquet versionado."
+    )
+    parser.add_argument("--output", default=MERGED_HOLDINGS_PATH, help="Ruta del parquet de salida")
+    parser.add_argument("--no-market-caps", action="store_true",
+                        help="No consultar market caps en vivo (usa la aproximación por Price per Share)")
+    args = parser.parse_args()
+
+    info, merged_data = build_merged_holdings(args.output, with_market_caps=not args.no_market_caps)
+
+    print("\n=== merged_holdings construido ===")
+    for key, value in info.items():
+        print(f"{key}: {value}")
+    print("\n=== Memoria por columna ===")
+    print(memory_report(merged_data).to_string())
+    print(f"\n✅ Guardado en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
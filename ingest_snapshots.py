@@ -0,0 +1,26 @@
+import argparse
+
+from utils.holdings_store import SNAPSHOT_PATTERN, STORE_PATH, HoldingsStore, find_snapshots
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Agrega exportaciones institutional_holders_all_*.csv al histórico particionado por fecha de reporte."
+    )
+    parser.add_argument("csv", nargs="*", help=f"Archivos a ingerir (por defecto: {SNAPSHOT_PATTERN})")
+    parser.add_argument("--store", default=STORE_PATH, help="Directorio del histórico")
+    args = parser.parse_args()
+
+    store = HoldingsStore(args.store)
+    files = args.csv or find_snapshots()
+    if not files:
+        print("⚠️ No se encontraron exportaciones para ingerir.")
+        return
+    for csv_path in files:
+        written = store.ingest_csv(csv_path)
+        print(f"{csv_path}: {written} filas nuevas")
+    print(f"\n✅ Fechas de reporte en {args.store}: {', '.join(d.strftime('%Y-%m-%d') for d in store.report_dates())}")
+
+
+if __name__ == "__main__":
+    main()
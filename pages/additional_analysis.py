@@ -2,27 +2,22 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import yfinance as yf
 import numpy as np                    # ← NECESARIO PARA np.isinf
-from utils.data_processing import color_percentage
+from utils.data_processing import style_holdings
+from utils.dataset import require_dataset
+from utils.reference_data import reference_data
 
 # Set custom page title for sidebar
 st.set_page_config(page_title="Análisis Adicional", layout="wide")
 
-if 'merged_data' not in st.session_state:
-    st.error("Datos no cargados. Por favor, revisa la página principal.")
-    st.stop()
+dataset = require_dataset()
 
 st.header("Análisis Adicional")
 
-merged_data = st.session_state.merged_data
-merged_data_display = st.session_state.merged_data_display
-general_data = st.session_state.merged_data
+general_data = dataset.merged_data
 
 # Apply global date filter
-if st.session_state.selected_date:
-    merged_data = merged_data[merged_data['Date'] == st.session_state.selected_date]
-    merged_data_display = merged_data_display[merged_data_display['Date'] == st.session_state.selected_date]
+merged_data = dataset.for_date(st.session_state.get('selected_date'))
 
 # Market Cap Influence
 st.subheader("Impacto de la Propiedad Institucional en la Capitalización de Mercado")
@@ -32,14 +27,17 @@ if ticker:
     ticker_data = merged_data[merged_data['Ticker'] == ticker]
     total_shares = general_data[general_data['Ticker'] == ticker]['Total Shares Outstanding'].iloc[0] * 1e6
 
-    try:
-        stock = yf.Ticker(ticker)
-        price = stock.info['regularMarketPrice']
+    # Precio del cache de datos de referencia: la página no hace requests al renderizar
+    quote = reference_data.lookup(ticker, "Price")
+    price = quote.value
+    if price is not None:
         market_cap = price * total_shares
         st.write(f"Precio actual de {ticker}: ${price:.2f}")
         st.write(f"Capitalización de Mercado de {ticker}: ${market_cap / 1e6:.2f} millones")
-    except Exception as e:
-        st.warning(f"No se pudo obtener el precio actual para {ticker} desde yfinance. Error: {e}")
+        if quote.stale:
+            st.caption(f"Precio del {quote.fetched_at:%Y-%m-%d %H:%M} UTC; se está actualizando en segundo plano.")
+    else:
+        st.warning(f"Todavía no hay un precio en cache para {ticker}; se está obteniendo en segundo plano.")
         st.info(f"Usando precio aproximado de los datos cargados: ${general_data[general_data['Ticker'] == ticker]['Price per Share'].iloc[0]:.2f}")
         price = general_data[general_data['Ticker'] == ticker]['Price per Share'].iloc[0]
         market_cap = price * total_shares
@@ -123,53 +121,49 @@ date_range_pandas = pd.to_datetime(date_range)
 filtered_data = merged_data[
     (merged_data['Date'] >= date_range_pandas[0]) & (merged_data['Date'] <= date_range_pandas[1])
 ]
-filtered_data_display = merged_data_display[
-    (merged_data_display['Date'] >= date_range_pandas[0]) & (merged_data_display['Date'] <= date_range_pandas[1])
-]
-filtered_data_display = filtered_data_display.sort_values(by='Shares Change % num', ascending=False)
+filtered_data_display = filtered_data.sort_values(by='Shares Change %', ascending=False)
 
 num_rows = st.slider("Número de filas a mostrar:", 1, min(1000, len(filtered_data_display)), 100)
 display_df = filtered_data_display.head(num_rows)
 display_cols = ['Date', 'Ticker', 'Owner Name', 'Shares Held', 'Shares Change', 'Shares Change %',
                 'Individual Holdings Value', 'Change as % of Market Cap']
-styled_df = display_df[display_cols].style.map(color_percentage, subset=["Shares Change %"]).format(
-    {'Change as % of Market Cap': '{:.4f}%'}
-)
+styled_df = style_holdings(display_df, display_cols)
 st.dataframe(styled_df)
 
-# Portfolio Analysis for Holders
+# Portfolio Analysis for Holders: tenedor y sentimiento salen del cubo precalculado
+cube = dataset.cube(st.session_state.get('selected_date'))
 st.subheader("Análisis de Cartera para Tenedores")
-holder_port_list = sorted(merged_data['Owner Name'].unique())
+holder_port_list = list(cube.holders)
 holder = st.selectbox("Selecciona un Tenedor para análisis de diversificación:", holder_port_list)
 if holder:
-    holder_portfolio = merged_data[merged_data['Owner Name'] == holder]
     st.write(f"### Diversificación de {holder}")
-    st.write(f"Número de Tickers Únicos: {holder_portfolio['Ticker'].nunique()}")
-    total_holdings_value = holder_portfolio['Individual Holdings Value'].sum()
+    st.write(f"Número de Tickers Únicos: {cube.holder_ticker_count(holder)}")
+    total_holdings_value = cube.holder_total(holder, 'Individual Holdings Value')
     formatted_value = f"${total_holdings_value / 1e3:.2f} mil millones" if total_holdings_value >= 1e3 else f"${total_holdings_value:.2f} millones"
     st.write(f"Valor Total de Tenencias: {formatted_value}")
 
 # Sentiment Indicator
 st.subheader("Indicador de Sentimiento a través de Tenencias")
-holder_sent_list = sorted(merged_data['Owner Name'].unique())
+holder_sent_list = list(cube.holders)
 holder = st.selectbox("Selecciona un Tenedor para análisis de sentimiento:", holder_sent_list)
 if holder:
-    holder_sentiment = merged_data[merged_data['Owner Name'] == holder].sort_values('Date')
+    active_dates = cube.holder_active_dates(holder)
+    holder_change = cube.holder_trend(holder, 'Shares Change')[active_dates]
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=holder_sentiment['Date'], y=holder_sentiment['Shares Change'],
+    fig.add_trace(go.Scatter(x=holder_change.index, y=holder_change.values,
                              mode='lines+markers',
-                             marker=dict(color=['green' if x > 0 else 'red' for x in holder_sentiment['Shares Change']])))
+                             marker=dict(color=['green' if x > 0 else 'red' for x in holder_change.values])))
     fig.update_layout(title=f'Sentimiento de {holder} a través de Cambios en Tenencias',
                       xaxis_title='Fecha', yaxis_title='Cambio en Acciones')
     st.plotly_chart(fig, use_container_width=True)
 
     st.subheader("Indicador de Sentimiento a través de Cambios % en Tenencias")
-    holder_sentiment_noinf = holder_sentiment[~np.isinf(holder_sentiment['Shares Change % num'])]
+    holder_change_pct = cube.holder_change_pct_trend(holder)[active_dates].dropna()
     fig_percent = go.Figure()
     fig_percent.add_trace(
-        go.Scatter(x=holder_sentiment_noinf['Date'], y=holder_sentiment_noinf['Shares Change % num'],
+        go.Scatter(x=holder_change_pct.index, y=holder_change_pct.values,
                    mode='lines+markers',
-                   marker=dict(color=['green' if x > 0 else 'red' for x in holder_sentiment_noinf['Shares Change % num']])))
+                   marker=dict(color=['green' if x > 0 else 'red' for x in holder_change_pct.values])))
     fig_percent.update_layout(title=f'Sentimiento de {holder} a través de Cambios % en Tenencias',
                               xaxis_title='Fecha', yaxis_title='Cambio en Acciones %')
-    st.plotly_chart(fig_percent, use_container_width=True)
\ No newline at end of file
+    st.plotly_chart(fig_percent, use_container_width=True)
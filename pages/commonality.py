@@ -1,14 +1,14 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
+from utils.dataset import require_dataset
+from utils.similarity import SIMILARITY_WEIGHTS
 
 
 # Set custom page title for sidebar
 st.set_page_config(page_title="Análisis de Coincidencias", layout="wide")
 
-if 'merged_data' not in st.session_state:
-    st.error("Datos no cargados. Por favor, revisa la página principal.")
-    st.stop()
+dataset = require_dataset()
 
 st.header("Análisis de Coincidencias")
 st.write("""
@@ -20,25 +20,20 @@ st.write("""
 **Calculación de Coincidencias:**
 - **Para Tenedores:** Porcentaje de todos los tickers únicos en los que cada tenedor está invertido.
 - **Para Tickers:** Porcentaje de todos los tenedores únicos que invierten en cada ticker.
+
+**Carteras Similares:**
+- **Coseno:** Compara las carteras ponderadas por valor o por porcentaje de participación (1 = misma composición).
+- **Jaccard:** Tickers en común dividido por el total de tickers distintos de ambas carteras.
 """)
 
-merged_data = st.session_state.merged_data
-merged_data_display = st.session_state.merged_data_display
 
-# Apply global date filter
-if st.session_state.selected_date:
-    merged_data = merged_data[merged_data['Date'] == st.session_state.selected_date]
-    merged_data_display = merged_data_display[merged_data_display['Date'] == st.session_state.selected_date]
+# Apply global date filter: los conteos salen del índice invertido, sin recorrer la tabla
+ownership = dataset.ownership(st.session_state.get('selected_date'))
 
 threshold = st.slider("Selecciona el umbral de coincidencia en porcentaje:", 0, 100, 50)
 
-def commonality(data, group_by, common_entity):
-    counts = data.groupby(group_by)['Ticker'].nunique() if common_entity == 'Ticker' else data.groupby(group_by)['Owner Name'].nunique()
-    total = len(data[common_entity].unique())
-    return ((counts / total) * 100).reset_index(name='Percentage')
-
 st.subheader("Tenedores Institucionales con más Tickers en Común")
-holder_commonality = commonality(merged_data, 'Owner Name', 'Ticker')
+holder_commonality = ownership.commonality('Owner Name')
 filtered_holders = holder_commonality[holder_commonality['Percentage'] >= threshold].sort_values('Percentage', ascending=False)
 if not filtered_holders.empty:
     st.dataframe(filtered_holders)
@@ -50,7 +45,7 @@ else:
     st.write(f"No hay tenedores institucionales con más de {threshold}% de tickers en común.")
 
 st.subheader("Tickers con más Tenedores Institucionales en Común")
-ticker_commonality = commonality(merged_data, 'Ticker', 'Owner Name')
+ticker_commonality = ownership.commonality('Ticker')
 filtered_tickers = ticker_commonality[ticker_commonality['Percentage'] >= threshold].sort_values('Percentage', ascending=False)
 if not filtered_tickers.empty:
     st.dataframe(filtered_tickers)
@@ -59,4 +54,19 @@ if not filtered_tickers.empty:
                  labels={'Percentage': f'Porcentaje de Tenedores Comunes'})
     st.plotly_chart(fig, use_container_width=True)
 else:
-    st.write(f"No hay tickers con más de {threshold}% de tenedores institucionales en común.")
\ No newline at end of file
+    st.write(f"No hay tickers con más de {threshold}% de tenedores institucionales en común.")
+st.subheader("Tenedores Institucionales con Carteras Similares")
+holder = st.selectbox("Selecciona un tenedor institucional:", ownership.holders)
+col1, col2, col3 = st.columns(3)
+metric = col1.radio("Métrica:", ["cosine", "jaccard"], format_func={"cosine": "Coseno", "jaccard": "Jaccard"}.get)
+weight_column = col2.radio("Ponderar por:", SIMILARITY_WEIGHTS, disabled=metric == "jaccard")
+k = col3.slider("Cantidad de tenedores:", 5, 50, 10)
+similar = dataset.similarity(st.session_state.get('selected_date'), weight_column).neighbours(holder, metric, k)
+if not similar.empty:
+    st.dataframe(similar, hide_index=True)
+    fig = px.bar(similar, x='Owner Name', y='Similitud',
+                 title=f"Tenedores con carteras más parecidas a {holder}",
+                 labels={'Similitud': 'Similitud (Coseno)' if metric == "cosine" else 'Similitud (Jaccard)'})
+    st.plotly_chart(fig, use_container_width=True)
+else:
+    st.write(f"No hay tenedores con tickers en común con {holder}.")
@@ -1,15 +1,15 @@
 import streamlit as st
 import pandas as pd
 import plotly.express as px
-from utils.plotting import plot_venn_like_comparison, plot_matplotlib_venn
-from utils.data_processing import color_percentage
+from utils.plotting import plot_venn_like_comparison, plot_matplotlib_venn, plot_upset, plot_jaccard_heatmap
+from utils.overlap import MAX_OVERLAP_ITEMS, overlap_regions, region_members, jaccard_matrix
+from utils.data_processing import style_holdings
+from utils.dataset import require_dataset
 
 # Set custom page title for sidebar
 st.set_page_config(page_title="Comparación", layout="wide")
 
-if 'merged_data' not in st.session_state:
-    st.error("Datos no cargados. Por favor, revisa la página principal.")
-    st.stop()
+dataset = require_dataset()
 
 st.header("Comparación")
 st.write("""
@@ -17,16 +17,32 @@ st.write("""
 - **Elige el tipo de comparación:** Puedes comparar tickers o tenedores institucionales.
 - **Selecciona 2 o 3 items:** Elige varios tickers o tenedores para comparar sus datos.
 - **Gráfico de Coincidencias:** Aparecerá un diagrama mostrando las coincidencias entre los items seleccionados.
+- **Coincidencias entre muchos items:** Con 2 a 20 items se muestran todas las combinaciones de coincidencia (gráfico UpSet) y la similitud de Jaccard entre cada par.
 """)
 
-merged_data = st.session_state.merged_data
-merged_data_display = st.session_state.merged_data_display
-general_data = st.session_state.merged_data
+general_data = dataset.merged_data
 
 # Apply global date filter
-if st.session_state.selected_date:
-    merged_data = merged_data[merged_data['Date'] == st.session_state.selected_date]
-    merged_data_display = merged_data_display[merged_data_display['Date'] == st.session_state.selected_date]
+merged_data = dataset.for_date(st.session_state.get('selected_date'))
+ownership = dataset.ownership(st.session_state.get('selected_date'))
+
+
+def show_overlaps(items, comparison_field, title_entities):
+    """Regiones de coincidencia (UpSet) y matriz de Jaccard para 2 a MAX_OVERLAP_ITEMS items."""
+    if len(items) > MAX_OVERLAP_ITEMS:
+        st.warning(f"El análisis de coincidencias admite hasta {MAX_OVERLAP_ITEMS} elementos.")
+        return
+    st.subheader(f"Coincidencias de {title_entities} entre todos los elementos")
+    regions = overlap_regions(ownership, items, comparison_field)
+    plot_upset(regions, items, title_entities)
+    st.dataframe(regions.drop(columns="Máscara"), hide_index=True)
+    region = st.selectbox("Ver integrantes de la combinación:", regions["Combinación"],
+                          key=f"{comparison_field}_region_choice")
+    if region is not None:
+        mask = regions.loc[regions["Combinación"] == region, "Máscara"].iloc[0]
+        st.write(", ".join(region_members(ownership, items, comparison_field, mask)))
+    plot_jaccard_heatmap(jaccard_matrix(ownership, items, comparison_field),
+                         f"Similitud de Jaccard de {title_entities} entre pares")
 
 comparison_type = st.radio("Elige el tipo de comparación:", ["Tickers", "Tenedores Institucionales"])
 
@@ -43,20 +59,19 @@ if comparison_type == "Tickers":
             )
             if chart_type == 'Burbujas (Interactivo)':
                 st.write("Este diagrama de burbujas muestra los tenedores únicos para cada ticker y las coincidencias.")
-                plot_venn_like_comparison(tickers, 'Ticker', merged_data)
+                plot_venn_like_comparison(tickers, 'Ticker', ownership)
             else:
                 st.write("Este diagrama de Venn muestra las proporciones exactas de tenedores únicos y compartidos.")
-                plot_matplotlib_venn(tickers, 'Ticker', merged_data)
+                plot_matplotlib_venn(tickers, 'Ticker', ownership)
+        if len(tickers) >= 2:
+            show_overlaps(tickers, 'Ticker', "Tenedores")
 
         comparison_data = merged_data[merged_data['Ticker'].isin(tickers)]
-        comparison_data_display = merged_data_display[merged_data_display['Ticker'].isin(tickers)]
-        comparison_data_display = comparison_data_display.sort_values(by='Shares Change % num', ascending=False)
+        comparison_data_display = comparison_data.sort_values(by='Shares Change %', ascending=False)
         st.write("### Tabla de Comparación de Tickers")
         display_cols = ["Date", "Ticker", "Owner Name", "Shares Held", "Shares Change", "Shares Change %",
                         "Percentage Owned", "Individual Holdings Value", "Change as % of Market Cap"]
-        styled_df = comparison_data_display[display_cols].style.map(color_percentage, subset=["Shares Change %"]).format(
-            {'Change as % of Market Cap': '{:.4f}%'}
-        )
+        styled_df = style_holdings(comparison_data_display, display_cols)
         st.dataframe(styled_df)
 
         for metric in ["Shares Held", "Percentage Owned", "Individual Holdings Value"]:
@@ -78,20 +93,19 @@ elif comparison_type == "Tenedores Institucionales":
             )
             if chart_type == 'Burbujas (Interactivo)':
                 st.write("Este diagrama de burbujas muestra los tickers únicos en la cartera de cada tenedor y las coincidencias.")
-                plot_venn_like_comparison(holders, 'Owner Name', merged_data)
+                plot_venn_like_comparison(holders, 'Owner Name', ownership)
             else:
                 st.write("Este diagrama de Venn muestra las proporciones exactas de tickers únicos y compartidos.")
-                plot_matplotlib_venn(holders, 'Owner Name', merged_data)
+                plot_matplotlib_venn(holders, 'Owner Name', ownership)
+        if len(holders) >= 2:
+            show_overlaps(holders, 'Owner Name', "Tickers")
 
         comparison_data = merged_data[merged_data['Owner Name'].isin(holders)]
-        comparison_data_display = merged_data_display[merged_data_display['Owner Name'].isin(holders)]
-        comparison_data_display = comparison_data_display.sort_values(by='Shares Change % num', ascending=False)
+        comparison_data_display = comparison_data.sort_values(by='Shares Change %', ascending=False)
         st.write("### Tabla de Comparación de Tenedores Institucionales")
         display_cols = ["Date", "Owner Name", "Ticker", "Shares Held", "Shares Change", "Shares Change %",
                         "Percentage Owned", "Individual Holdings Value", "Change as % of Market Cap"]
-        styled_df = comparison_data_display[display_cols].style.map(color_percentage, subset=["Shares Change %"]).format(
-            {'Change as % of Market Cap': '{:.4f}%'}
-        )
+        styled_df = style_holdings(comparison_data_display, display_cols)
         st.dataframe(styled_df)
 
         for metric in ["Shares Held", "Percentage Owned", "Individual Holdings Value"]:
@@ -0,0 +1,49 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+from utils.dataset import require_dataset
+from utils.ranking import top_bottom_k
+
+# Set custom page title for sidebar
+st.set_page_config(page_title="Ranking de Crowding", layout="wide")
+
+dataset = require_dataset()
+
+st.header("Ranking de Crowding")
+st.write("""
+Esta sección clasifica los tickers según qué tan concentrados y superpuestos están sus tenedores institucionales.
+- **HHI:** Suma de las participaciones al cuadrado de cada tenedor sobre las acciones institucionales del ticker (1 = un solo tenedor).
+- **Top 10 Share:** Fracción de las acciones institucionales en manos de los 10 mayores tenedores.
+- **Owner Overlap:** Similitud promedio (coseno) entre las carteras de cada par de tenedores del ticker.
+- **Crowding Score:** Promedio de los percentiles de las tres métricas dentro de la fecha de reporte (0-100).
+""")
+
+# Apply global date filter: sin fecha seleccionada se usa la última fecha de reporte
+crowding = dataset.crowding()
+if crowding.empty:
+    st.warning("No hay datos de crowding disponibles.")
+    st.stop()
+selected_date = st.session_state.get('selected_date')
+report_date = pd.Timestamp(selected_date) if selected_date is not None else crowding['Date'].max()
+crowding = crowding[crowding['Date'] == report_date]
+st.write(f"Fecha de reporte: **{report_date.date()}**")
+
+metric = st.selectbox("Ordenar por:", ["Crowding Score", "HHI", "Top 10 Share", "Owner Overlap"])
+min_holders = st.slider("Mínimo de tenedores por ticker:", 1, 200, 10)
+ranked = crowding[crowding['Holders'] >= min_holders]
+most, least = top_bottom_k(ranked, metric)
+
+col1, col2 = st.columns(2)
+with col1:
+    st.subheader("🔥 Tickers más concentrados")
+    fig = px.bar(most, x='Ticker', y=metric, hover_data=['Holders'], title=f"Top 20 Tickers por {metric}")
+    st.plotly_chart(fig, use_container_width=True)
+with col2:
+    st.subheader("🌐 Tickers menos concentrados")
+    fig = px.bar(least, x='Ticker', y=metric, hover_data=['Holders'], title=f"Últimos 20 Tickers por {metric}")
+    st.plotly_chart(fig, use_container_width=True)
+
+with st.expander("Ver tabla completa"):
+    st.dataframe(ranked.sort_values(metric, ascending=False).style.format({
+        'HHI': '{:.4f}', 'Top 10 Share': '{:.2%}', 'Owner Overlap': '{:.3f}', 'Crowding Score': '{:.1f}',
+    }), hide_index=True)
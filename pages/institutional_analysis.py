@@ -3,14 +3,14 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from utils.plotting import plot_top_20, plot_changes
-from utils.data_processing import color_percentage
+from utils.data_processing import style_holdings
+from utils.dataset import require_dataset
+from utils.ranking import top_k
 
 # Set custom page title for sidebar
 st.set_page_config(page_title="Análisis de Tenedores", layout="wide")
 
-if 'merged_data' not in st.session_state:
-    st.error("Datos no cargados. Por favor, revisa la página principal.")
-    st.stop()
+dataset = require_dataset()
 
 st.header("Análisis de Tenedor Institucional")
 st.write("""
@@ -24,28 +24,21 @@ st.write("""
 - **Cambio en Acciones %:** Porcentaje de cambio en las acciones mantenidas (verde para aumentos, rojo para disminuciones).
 """)
 
-merged_data = st.session_state.merged_data
-merged_data_display = st.session_state.merged_data_display
 
 # Apply global date filter
-if st.session_state.selected_date:
-    merged_data = merged_data[merged_data['Date'] == st.session_state.selected_date]
-    merged_data_display = merged_data_display[merged_data_display['Date'] == st.session_state.selected_date]
+merged_data = dataset.for_date(st.session_state.get('selected_date'))
 
 institutional_holders_list = sorted(merged_data["Owner Name"].unique())
 selected_holder = st.selectbox("Selecciona un Tenedor Institucional:", institutional_holders_list)
 
 holder_data = merged_data[merged_data["Owner Name"] == selected_holder]
-holder_data_display = merged_data_display[merged_data_display["Owner Name"] == selected_holder]
-holder_data_display = holder_data_display.sort_values(by='Shares Change % num', ascending=False)
+holder_data_display = holder_data.sort_values(by='Shares Change %', ascending=False)
 
 if not holder_data.empty:
     st.write(f"### Tenencias de {selected_holder}")
     display_cols = ["Date", "Ticker", "Shares Held", "Shares Change", "Shares Change %", "Percentage Owned",
                     "Individual Holdings Value", "Change as % of Market Cap"]
-    styled_df = holder_data_display[display_cols].style.map(color_percentage, subset=["Shares Change %"]).format(
-        {'Change as % of Market Cap': '{:.4f}%'}
-    )
+    styled_df = style_holdings(holder_data_display, display_cols)
     st.dataframe(styled_df)
 
     st.write("### Acciones Mantenidas por Empresa")
@@ -59,11 +52,11 @@ if not holder_data.empty:
     plot_changes(holder_data, "Ticker", "Shares Change", f"Cambio en Acciones por Empresa de {selected_holder}")
 
     st.write("### Cambio en Acciones % por Empresa")
-    plot_changes(holder_data, "Ticker", "Shares Change % num",
+    plot_changes(holder_data, "Ticker", "Shares Change %",
                  f"Cambio en Acciones % por Empresa de {selected_holder}", is_percentage=True)
 
     st.write("### Rank de Tenencias Más Valiosas (por Valor Total)")
-    holder_val_sorted = holder_data.sort_values(by="Individual Holdings Value", ascending=False).head(20)
+    holder_val_sorted = top_k(holder_data, "Individual Holdings Value", 20)
     fig_val = px.bar(holder_val_sorted, x="Ticker", y="Individual Holdings Value",
                      title=f"Tenencias Más Valiosas de {selected_holder} (en millones USD)",
                      color_discrete_sequence=["blue"])
@@ -71,7 +64,7 @@ if not holder_data.empty:
     st.plotly_chart(fig_val, use_container_width=True)
 
     st.write("### Rank de Cambios en Posiciones Más Valiosos (por USD)")
-    holder_change_sorted = holder_data.sort_values(by="Change in Value", ascending=False).head(20)
+    holder_change_sorted = top_k(holder_data, "Change in Value", 20)
     colors = ['green' if val > 0 else 'red' if val < 0 else 'grey' for val in holder_change_sorted["Change in Value"]]
     fig_change = go.Figure(data=[
         go.Bar(x=holder_change_sorted["Ticker"], y=holder_change_sorted["Change in Value"], marker_color=colors)
@@ -1,28 +1,20 @@
 import streamlit as st
-from utils.data_processing import load_data, get_market_caps, preprocess_data
+from utils.dataset import require_dataset
 from utils.plotting import plot_market_concentration
 
 st.set_page_config(page_title="Concentración de Mercado", layout="wide")
 st.title("🏛️ Concentración de Mercado por Sector / Industria")
 
 # === Cargar datos ===
-institutional_holders, general_data = load_data()
-live_market_caps = get_market_caps(general_data['Ticker'].unique())
-merged_data, _ = preprocess_data(institutional_holders, general_data, live_market_caps)
-
-# 🔹 Asegurarse de que las columnas existen y rellenar NaN
-for col in ["Sector", "Industry"]:
-    if col not in merged_data.columns:
-        merged_data[col] = "Sin Datos"
-    else:
-        merged_data[col] = merged_data[col].fillna("Sin Datos")
+dataset = require_dataset()
+merged_data = dataset.merged_data
 
 # === Selección de nivel de análisis ===
 nivel_radio = st.radio("📊 Nivel de análisis:", ["Sector", "Industria"])
 group_field = "Sector" if nivel_radio == "Sector" else "Industry"
 
 # === Filtros adicionales ===
-filtered_data = merged_data.copy()
+filtered_data = merged_data
 if group_field == "Industry":
     selected_sector = st.selectbox("Filtrar por Sector:", merged_data["Sector"].unique())
     filtered_data = filtered_data[filtered_data["Sector"] == selected_sector]
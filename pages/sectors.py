@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from utils.data_processing import load_data, get_market_caps, preprocess_data
+from utils.dataset import require_dataset
 from utils.plotting import (
     plot_top_20,
     plot_holder_composition,
@@ -15,16 +15,8 @@ st.set_page_config(page_title="Tenedores Institucionales por Sector e Industria"
 st.title("🏦 Tenedores Institucionales por Sector e Industria")
 
 # === Cargar datos ===
-institutional_holders, general_data = load_data()
-live_market_caps = get_market_caps(general_data['Ticker'].unique())
-merged_data, merged_data_display = preprocess_data(institutional_holders, general_data, live_market_caps)
-
-# 🔹 Asegurarse de que las columnas existen y rellenar NaN
-for col in ["Sector", "Industry"]:
-    if col not in merged_data.columns:
-        merged_data[col] = "Sin Datos"
-    else:
-        merged_data[col] = merged_data[col].fillna("Sin Datos")
+dataset = require_dataset()
+merged_data = dataset.merged_data
 
 # === Selección de nivel de análisis ===
 opcion = st.radio("📊 Seleccionar nivel de análisis:", ["Sector", "Industria"])
@@ -32,7 +24,7 @@ group_field = "Sector" if opcion == "Sector" else "Industry"
 
 # === Calcular estadísticas por grupo ANTES de las tabs ===
 group_stats = (
-    merged_data.groupby(group_field)
+    merged_data.groupby(group_field, observed=True)
     .agg({
         "Individual Holdings Value": "sum",
         "Percentage Owned": "mean",
@@ -79,7 +71,7 @@ with tabs[2]:
     if selected:
         filtered = merged_data[merged_data[group_field] == selected]
         top_holders = (
-            filtered.groupby("Owner Name")
+            filtered.groupby("Owner Name", observed=True)
             .agg({
                 "Individual Holdings Value": "sum",
                 "Shares Held": "sum"
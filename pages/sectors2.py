@@ -1,21 +1,13 @@
 import streamlit as st
-from utils.data_processing import load_data, get_market_caps, preprocess_data
+from utils.dataset import require_dataset
 from utils.plotting import plot_holder_distribution, plot_holders_heatmap
 
 st.set_page_config(page_title="Distribución de holdings por tenedor", layout="wide")
 st.title("📊 Distribución de holdings por tenedor")
 
 # === Cargar datos ===
-institutional_holders, general_data = load_data()
-live_market_caps = get_market_caps(general_data['Ticker'].unique())
-merged_data, merged_data_display = preprocess_data(institutional_holders, general_data, live_market_caps)
-
-# 🔹 Asegurarse de que las columnas existen y rellenar NaN
-for col in ["Sector", "Industry"]:
-    if col not in merged_data.columns:
-        merged_data[col] = "Sin Datos"
-    else:
-        merged_data[col] = merged_data[col].fillna("Sin Datos")
+dataset = require_dataset()
+merged_data = dataset.merged_data
 
 # === Selección de categoría ===
 group_field = st.radio("Seleccionar categoría para filtrar:", ["Sector", "Industry"])
@@ -34,7 +26,7 @@ n_filter = st.number_input("Mostrar solo top/bottom N tenedores por valor total:
 top_bottom_option = st.radio("Top o Bottom:", ["Top", "Bottom"])
 
 # Aplicar filtro por valor total
-holder_totals = filtered_data.groupby("Owner Name")["Individual Holdings Value"].sum().reset_index()
+holder_totals = filtered_data.groupby("Owner Name", observed=True)["Individual Holdings Value"].sum().reset_index()
 holder_totals = holder_totals.sort_values("Individual Holdings Value", ascending=(top_bottom_option=="Bottom"))
 top_bottom_holders = holder_totals.head(n_filter)["Owner Name"]
 filtered_data = filtered_data[filtered_data["Owner Name"].isin(top_bottom_holders)]
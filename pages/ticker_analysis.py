@@ -3,14 +3,14 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from utils.plotting import plot_top_20, plot_changes
-from utils.data_processing import color_percentage
+from utils.data_processing import style_holdings
+from utils.dataset import require_dataset
+from utils.ranking import top_k
 
 # Set custom page title for sidebar
 st.set_page_config(page_title="Análisis por Ticker", layout="wide")
 
-if 'merged_data' not in st.session_state:
-    st.error("Datos no cargados. Por favor, revisa la página principal.")
-    st.stop()
+dataset = require_dataset()
 
 st.header("Análisis por Ticker")
 st.write("""
@@ -25,21 +25,16 @@ st.write("""
 - **Cambio en Acciones %:** Porcentaje de cambio en las acciones mantenidas (verde para aumentos, rojo para disminuciones).
 """)
 
-merged_data = st.session_state.merged_data
-merged_data_display = st.session_state.merged_data_display
-general_data = st.session_state.merged_data  # Note: general_data is part of merged_data
+general_data = dataset.merged_data  # Note: general_data is part of merged_data
 
 # Apply global date filter
-if st.session_state.selected_date:
-    merged_data = merged_data[merged_data['Date'] == st.session_state.selected_date]
-    merged_data_display = merged_data_display[merged_data_display['Date'] == st.session_state.selected_date]
+merged_data = dataset.for_date(st.session_state.get('selected_date'))
 
 tickers_list = sorted(general_data["Ticker"].unique())
 selected_ticker = st.selectbox("Selecciona un Ticker:", tickers_list)
 
 ticker_data = merged_data[merged_data["Ticker"] == selected_ticker]
-ticker_data_display = merged_data_display[merged_data_display["Ticker"] == selected_ticker]
-ticker_data_display = ticker_data_display.sort_values(by='Shares Change % num', ascending=False)
+ticker_data_display = ticker_data.sort_values(by='Shares Change %', ascending=False)
 general_ticker_data = general_data[general_data["Ticker"] == selected_ticker]
 
 if not ticker_data.empty:
@@ -52,9 +47,7 @@ if not ticker_data.empty:
     st.write(f"### Tenedores Institucionales para {selected_ticker}")
     display_cols = ["Date", "Owner Name", "Shares Held", "Shares Change", "Shares Change %", "Percentage Owned",
                     "Individual Holdings Value", "Change as % of Market Cap"]
-    styled_df = ticker_data_display[display_cols].style.map(color_percentage, subset=["Shares Change %"]).format(
-        {'Change as % of Market Cap': '{:.4f}%'}
-    )
+    styled_df = style_holdings(ticker_data_display, display_cols)
     st.dataframe(styled_df)
 
     st.write("### Acciones Mantenidas por Tenedores Institucionales")
@@ -70,11 +63,11 @@ if not ticker_data.empty:
                  f"Cambio en Acciones por Tenedores Institucionales para {selected_ticker}")
 
     st.write("### Cambio en Acciones % por Tenedores Institucionales")
-    plot_changes(ticker_data, "Owner Name", "Shares Change % num",
+    plot_changes(ticker_data, "Owner Name", "Shares Change %",
                  f"Cambio en Acciones % por Tenedores Institucionales para {selected_ticker}", is_percentage=True)
 
     st.write("### Rank de Tenencias Más Valiosas (por Valor Total)")
-    ticker_val_sorted = ticker_data.sort_values(by="Individual Holdings Value", ascending=False).head(20)
+    ticker_val_sorted = top_k(ticker_data, "Individual Holdings Value", 20)
     fig_val = px.bar(ticker_val_sorted, x="Owner Name", y="Individual Holdings Value",
                      title=f"Tenencias Más Valiosas en {selected_ticker} (en millones USD)",
                      color_discrete_sequence=["blue"])
@@ -82,7 +75,7 @@ if not ticker_data.empty:
     st.plotly_chart(fig_val, use_container_width=True)
 
     st.write("### Rank de Cambios en Posiciones Más Valiosos (por USD)")
-    ticker_change_sorted = ticker_data.sort_values(by="Change in Value", ascending=False).head(20)
+    ticker_change_sorted = top_k(ticker_data, "Change in Value", 20)
     colors = ['green' if val > 0 else 'red' if val < 0 else 'grey' for val in ticker_change_sorted["Change in Value"]]
     fig_change = go.Figure(data=[
         go.Bar(x=ticker_change_sorted["Owner Name"], y=ticker_change_sorted["Change in Value"], marker_color=colors)
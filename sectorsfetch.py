@@ -1,30 +1,145 @@
+import argparse
+import os
+
 import pandas as pd
-import yfinance as yf
 
-def add_sector_industry(parquet_path="general_data.parquet", output_path="general_data_with_info.parquet"):
-    # Load parquet
+from utils.etl import source_hash
+from utils.market_data import MarketDataFetcher, load_symbol_map
+from utils.quote_providers import get_provider
+from utils.reference_data import ReferenceData, REFERENCE_DATA_CACHE
+
+ENRICH_COLUMNS = ["Sector", "Industry"]
+CHECKPOINT_EVERY = 50  # tickers por lote entre checkpoints
+
+
+def checkpoint_path_for(output_path):
+    return f"{output_path}.checkpoint.parquet"
+
+
+def _write_atomic(df, path):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    df.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, input_hash):
+    """
+    Tickers ya consultados en una corrida anterior (Ticker, Sector, Industry); vacío si no
+    hay o si se guardó para otro archivo de entrada (`input_hash`, ver `source_hash`).
+    """
+    if os.path.exists(path):
+        checkpoint = pd.read_parquet(path)
+        if "Input Hash" in checkpoint.columns and (checkpoint["Input Hash"] == input_hash).all():
+            return checkpoint[["Ticker"] + ENRICH_COLUMNS]
+    return pd.DataFrame(columns=["Ticker"] + ENRICH_COLUMNS, dtype="object")
+
+
+def already_enriched(output_path):
+    """Sector/Industry de una salida previa, solo para los tickers que ya tienen Sector."""
+    if not os.path.exists(output_path):
+        return pd.DataFrame(columns=["Ticker"] + ENRICH_COLUMNS, dtype="object")
+    previous = pd.read_parquet(output_path)
+    if not set(ENRICH_COLUMNS) <= set(previous.columns):
+        return pd.DataFrame(columns=["Ticker"] + ENRICH_COLUMNS, dtype="object")
+    return previous.loc[previous["Sector"].notna(), ["Ticker"] + ENRICH_COLUMNS]
+
+
+def cached_sectors(reference, tickers):
+    """Sector/Industry vigentes en el cache de datos de referencia, para los tickers con Sector."""
+    sectors = reference.cached(tickers, "Sector")
+    industries = reference.cached(list(sectors), "Industry")
+    return pd.DataFrame({
+        "Ticker": list(sectors),
+        "Sector": list(sectors.values()),
+        "Industry": [industries.get(t) for t in sectors],
+    }, dtype="object")
+
+
+def add_sector_industry(parquet_path="general_data.parquet", output_path="general_data_with_info.parquet",
+                        max_workers=8, requests_per_second=5.0, checkpoint_every=CHECKPOINT_EVERY,
+                        force=False, symbol_map=None, fetcher=None, reference_path=REFERENCE_DATA_CACHE,
+                        provider=None):
+    """
+    Agrega Sector e Industry a `parquet_path` consultando Yahoo en paralelo a través del
+    servicio de datos de referencia (el mismo request deja market cap y precio en su cache).
+
+    - Los tickers que ya tienen Sector en `output_path` o vigente en el cache de
+      referencia no se vuelven a consultar (salvo `force`).
+    - Cada `checkpoint_every` tickers se guarda lo obtenido en `<output>.checkpoint.parquet`;
+      si la corrida se corta, la siguiente retoma desde ahí. El checkpoint queda atado al
+      contenido de `parquet_path` y `force` lo descarta.
+    - `symbol_map` traduce tickers al símbolo de Yahoo (ver `SYMBOL_MAP`).
+    - `provider` reemplaza a yfinance (ver `get_provider`), p. ej. un ReplayProvider sin red.
+    """
     df = pd.read_parquet(parquet_path)
+    checkpoint_path = checkpoint_path_for(output_path)
+    input_hash = source_hash([parquet_path])
+    if force and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
 
-    # Prepare new columns
-    df["Sector"] = None
-    df["Industry"] = None
+    fetcher = fetcher or MarketDataFetcher(provider=provider, max_workers=max_workers,
+                                           requests_per_second=requests_per_second, symbol_map=symbol_map)
+    reference = ReferenceData(reference_path, fetcher=fetcher)
+    tickers = list(dict.fromkeys(df["Ticker"]))
 
-    for idx, ticker in enumerate(df["Ticker"]):
-        # Handle BRK.B exception
-        yf_ticker = "BRK-B" if ticker == "BRK.B" else ticker
+    # 🔹 Resultados conocidos: salida previa + cache de referencia + checkpoint (el más reciente gana)
+    known = pd.concat([
+        already_enriched(output_path) if not force else None,
+        cached_sectors(reference, tickers) if not force else None,
+        load_checkpoint(checkpoint_path, input_hash),
+    ], ignore_index=True).drop_duplicates("Ticker", keep="last")
+    pending = [t for t in tickers if t not in set(known["Ticker"])]
+    print(f"{len(tickers) - len(pending)} tickers ya enriquecidos, {len(pending)} por consultar")
 
-        try:
-            info = yf.Ticker(yf_ticker).info
-            df.at[idx, "Sector"] = info.get("sector", None)
-            df.at[idx, "Industry"] = info.get("industry", None)
+    checkpoint = load_checkpoint(checkpoint_path, input_hash)
+    failed = {}
+    for start in range(0, len(pending), max(1, checkpoint_every)):
+        batch = pending[start:start + checkpoint_every]
+        rows, errors = reference.fetch(batch)
+        failed.update(errors)
+        fetched = pd.DataFrame({
+            "Ticker": list(rows),
+            **{col: [rows[t][col] for t in rows] for col in ENRICH_COLUMNS},
+        }, dtype="object")
+        if not fetched.empty:
+            checkpoint = pd.concat([checkpoint, fetched], ignore_index=True).drop_duplicates("Ticker", keep="last")
+            _write_atomic(checkpoint.assign(**{"Input Hash": input_hash}), checkpoint_path)
+            known = pd.concat([known, fetched], ignore_index=True).drop_duplicates("Ticker", keep="last")
+        print(f"[{min(start + len(batch), len(pending))}/{len(pending)}] {len(rows)} ok, "
+              f"{len(batch) - len(rows)} sin datos")
 
-            print(f"[{idx+1}/{len(df)}] {ticker}: sector={df.at[idx,'Sector']} | industry={df.at[idx,'Industry']}")
-        except Exception as e:
-            print(f"[{idx+1}/{len(df)}] {ticker}: error fetching data → {e}")
+    # 🔹 Unir por ticker y guardar la salida completa de una vez
+    known = known.set_index("Ticker")
+    for col in ENRICH_COLUMNS:
+        df[col] = df["Ticker"].map(known[col]).astype("object")
+    _write_atomic(df, output_path)
 
-    # Save updated parquet
-    df.to_parquet(output_path, index=False)
+    for ticker, error in failed.items():
+        print(f"{ticker}: error fetching data → {error}")
+    if not failed and os.path.exists(checkpoint_path):
+        # Todo quedó en la salida; el checkpoint ya no hace falta
+        os.remove(checkpoint_path)
     print(f"\n✅ Saved enriched parquet to: {output_path}")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Agrega Sector e Industry desde Yahoo Finance, con checkpoint y reanudación.")
+    parser.add_argument("--input", default="general_data.parquet")
+    parser.add_argument("--output", default="general_data_with_info.parquet")
+    parser.add_argument("--workers", type=int, default=8, help="Tickers consultados en simultáneo")
+    parser.add_argument("--rate", type=float, default=5.0, help="Requests por segundo hacia Yahoo")
+    parser.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY)
+    parser.add_argument("--symbol-map", help="CSV con columnas Ticker,Symbol que se suma a SYMBOL_MAP")
+    parser.add_argument("--provider", help="yfinance, replay:<archivo.json> o record:<archivo.json> "
+                                           "(por defecto QUOTE_PROVIDER o yfinance)")
+    parser.add_argument("--force", action="store_true", help="Volver a consultar también los tickers ya enriquecidos")
+    args = parser.parse_args()
+
+    add_sector_industry(args.input, args.output, max_workers=args.workers, requests_per_second=args.rate,
+                        checkpoint_every=args.checkpoint_every, force=args.force,
+                        symbol_map=load_symbol_map(args.symbol_map), provider=get_provider(args.provider))
+
 
 if __name__ == "__main__":
-    add_sector_industry()
+    main()
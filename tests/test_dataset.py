@@ -0,0 +1,68 @@
+import os
+
+import pandas as pd
+import pytest
+
+import utils.dataset as dataset_module
+import utils.etl as etl_module
+from utils.data_processing import GENERAL_DATA_PATH, HOLDERS_PATH
+from utils.etl import build_merged_holdings
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_TICKERS = ["PKX", "WB", "TMUS"]
+
+
+class FakeMarketCaps:
+    """Reemplaza a `get_market_caps` (st.cache_data): devuelve los valores de `caps`."""
+
+    def __init__(self, caps):
+        self.caps = dict(caps)
+
+    def __call__(self, tickers):
+        return {t: self.caps[t] for t in tickers if t in self.caps}
+
+    def clear(self):
+        pass
+
+
+@pytest.fixture
+def sample_repo(tmp_path, monkeypatch):
+    """Directorio con unos pocos tickers de los parquet del repo y market caps falsos."""
+    general_data = pd.read_parquet(os.path.join(REPO, GENERAL_DATA_PATH))
+    holders = pd.read_parquet(os.path.join(REPO, HOLDERS_PATH))
+    general_data[general_data["Ticker"].isin(SAMPLE_TICKERS)].to_parquet(tmp_path / GENERAL_DATA_PATH, index=False)
+    holders[holders["Ticker"].isin(SAMPLE_TICKERS)].to_parquet(tmp_path / HOLDERS_PATH, index=False)
+    monkeypatch.chdir(tmp_path)
+
+    caps = FakeMarketCaps({t: 1e9 for t in SAMPLE_TICKERS})
+    monkeypatch.setattr(dataset_module, "get_market_caps", caps)
+    monkeypatch.setattr(etl_module, "refresh_market_caps", caps)
+    monkeypatch.setattr(dataset_module, "_dataset", None)
+    return caps
+
+
+def market_cap(ticker):
+    merged_data = dataset_module.get_dataset().merged_data
+    return merged_data.loc[merged_data["Ticker"] == ticker, "Market Cap"].unique().tolist()
+
+
+def test_full_refresh_uses_new_market_caps(sample_repo):
+    build_merged_holdings()
+    assert dataset_module.refresh_dataset(full=True)["mode"] == "full"
+    assert market_cap("WB") == [1e9]
+
+    # 🔹 El parquet construido sigue al día, pero tiene el market cap viejo
+    sample_repo.caps["WB"] = 2e9
+    dataset_module.refresh_dataset(full=True)
+    assert market_cap("WB") == [2e9]
+
+
+def test_full_refresh_without_sources_applies_live_market_caps(sample_repo):
+    build_merged_holdings()
+    os.remove(HOLDERS_PATH)
+    os.remove(GENERAL_DATA_PATH)
+
+    sample_repo.caps["TMUS"] = 3e9
+    dataset_module.refresh_dataset(full=True)
+    assert market_cap("TMUS") == [3e9]
+    assert market_cap("WB") == [1e9]
@@ -0,0 +1,31 @@
+import pandas as pd
+
+from utils.holdings_store import HoldingsStore
+
+
+def holdings(rows):
+    df = pd.DataFrame(rows, columns=["Holder", "Ticker", "Date Reported", "Shares"])
+    df["Date Reported"] = pd.to_datetime(df["Date Reported"])
+    df["Fetch_Date"] = pd.Timestamp("2024-07-15")
+    return df
+
+
+def test_latest_as_of_drops_exited_positions(tmp_path):
+    store = HoldingsStore(str(tmp_path / "store"))
+    store.ingest(holdings([
+        ("Fund", "AAPL", "2024-03-31", 10.0),
+        ("Fund", "MSFT", "2024-03-31", 5.0),
+        # 🔹 En el reporte siguiente el fondo ya no tiene MSFT
+        ("Fund", "AAPL", "2024-06-30", 12.0),
+        ("Other", "MSFT", "2024-03-31", 7.0),
+    ]), "snapshot.csv")
+
+    latest = store.latest_as_of()
+    assert sorted(zip(latest["Holder"], latest["Ticker"], latest["Shares"])) == [
+        ("Fund", "AAPL", 12.0), ("Other", "MSFT", 7.0),
+    ]
+
+    as_of_march = store.latest_as_of("2024-04-30")
+    assert sorted(zip(as_of_march["Holder"], as_of_march["Ticker"], as_of_march["Shares"])) == [
+        ("Fund", "AAPL", 10.0), ("Fund", "MSFT", 5.0), ("Other", "MSFT", 7.0),
+    ]
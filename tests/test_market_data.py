@@ -0,0 +1,27 @@
+import logging
+
+from utils.market_data import get_host_limiter
+
+
+def test_host_limiter_keeps_the_stricter_rate(caplog):
+    limiter = get_host_limiter("test-stricter-host", 5.0)
+
+    with caplog.at_level(logging.WARNING, logger="utils.market_data"):
+        assert get_host_limiter("test-stricter-host", 10.0) is limiter
+        assert limiter.rate == 5.0
+        assert get_host_limiter("test-stricter-host", 0) is limiter
+        assert limiter.rate == 5.0
+        assert get_host_limiter("test-stricter-host", 2.0) is limiter
+        assert limiter.rate == 2.0
+    assert len(caplog.records) == 3
+
+    caplog.clear()
+    with caplog.at_level(logging.WARNING, logger="utils.market_data"):
+        get_host_limiter("test-stricter-host", 2.0)
+    assert not caplog.records
+
+
+def test_unlimited_host_limiter_takes_a_rate():
+    limiter = get_host_limiter("test-unlimited-host", 0)
+    get_host_limiter("test-unlimited-host", 3.0)
+    assert limiter.rate == 3.0
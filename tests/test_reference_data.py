@@ -0,0 +1,72 @@
+from datetime import timedelta
+
+import pandas as pd
+
+from utils.market_data import MarketDataFetcher
+from utils.quote_providers import QuoteProvider
+from utils.reference_data import ReferenceData
+
+
+class StubProvider(QuoteProvider):
+    """Responde desde un dict; los símbolos en `failing` lanzan un error como un timeout de red."""
+
+    name = "stub"
+    rate_limited = False
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.failing = set()
+
+    def get_info(self, symbol):
+        if symbol in self.failing:
+            raise TimeoutError(f"{symbol}: sin respuesta")
+        return self.responses[symbol]
+
+
+def make_reference(tmp_path, provider):
+    fetcher = MarketDataFetcher(provider=provider, retries=0, timeout=5.0)
+    return ReferenceData(str(tmp_path / "reference.parquet"), fetcher=fetcher)
+
+
+def test_fetch_error_keeps_other_cached_fields(tmp_path):
+    provider = StubProvider({"AAPL": {"marketCap": 3e12, "regularMarketPrice": 200.0,
+                                      "sector": "Technology", "industry": "Consumer Electronics"}})
+    reference = make_reference(tmp_path, provider)
+    reference.fetch(["AAPL"])
+
+    # 🔹 El precio vence (15 min) antes que el resto de los campos
+    later = pd.Timestamp.now(tz="UTC") + timedelta(minutes=30)
+    assert reference.cache.stale_tickers(["AAPL"], now=later, columns=["Price"]) == ["AAPL"]
+
+    provider.failing.add("AAPL")
+    rows, errors = reference.fetch(["AAPL"])
+    assert rows == {} and "AAPL" in errors
+
+    for field, value in [("Sector", "Technology"), ("Industry", "Consumer Electronics"), ("Market Cap", 3e12)]:
+        cached = reference.lookup("AAPL", field)
+        assert cached.value == value
+        assert not cached.stale
+    assert reference.cache.stale_tickers(["AAPL"], now=later, columns=["Price"]) == ["AAPL"]
+
+
+def test_answer_without_field_is_a_miss(tmp_path):
+    provider = StubProvider({"XYZ": {"marketCap": 1e9}})
+    reference = make_reference(tmp_path, provider)
+    reference.fetch(["XYZ"])
+
+    assert reference.lookup("XYZ", "Market Cap").value == 1e9
+    sector = reference.lookup("XYZ", "Sector")
+    assert sector.value is None and not sector.stale
+
+
+def test_update_merges_per_field(tmp_path):
+    reference = make_reference(tmp_path, StubProvider({}))
+    cache = reference.cache
+    first = pd.Timestamp("2025-01-01", tz="UTC")
+    cache.update({"AAPL": {"Sector": "Technology", "Price": 100.0}}, now=first)
+    cache.update({"AAPL": {"Price": 101.0}}, now=first + timedelta(hours=1))
+
+    sector = cache.entries(["AAPL"], column="Sector", now=first).iloc[0]
+    price = cache.entries(["AAPL"], column="Price", now=first).iloc[0]
+    assert sector["Sector"] == "Technology" and sector["fetched_at"] == first
+    assert price["Price"] == 101.0 and price["fetched_at"] == first + timedelta(hours=1)
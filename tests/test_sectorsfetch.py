@@ -0,0 +1,42 @@
+import json
+import os
+
+import pandas as pd
+
+from sectorsfetch import add_sector_industry, checkpoint_path_for
+from utils.market_data import MarketDataFetcher
+from utils.quote_providers import ReplayProvider
+
+
+def run(tmp_path, responses, tickers, force=False):
+    """Corre el enriquecimiento con un ReplayProvider; los tickers sin respuesta fallan."""
+    quotes = tmp_path / "quotes.json"
+    quotes.write_text(json.dumps(responses))
+    pd.DataFrame({"Ticker": tickers}).to_parquet(tmp_path / "general.parquet", index=False)
+    fetcher = MarketDataFetcher(provider=ReplayProvider(str(quotes)), retries=0)
+    return add_sector_industry(str(tmp_path / "general.parquet"), str(tmp_path / "out.parquet"),
+                               fetcher=fetcher, force=force, reference_path=str(tmp_path / "reference.parquet"))
+
+
+def sectors(df):
+    return dict(zip(df["Ticker"], df["Sector"]))
+
+
+def test_force_ignores_checkpoint(tmp_path):
+    # 🔹 B no responde: el checkpoint queda con A
+    run(tmp_path, {"A": {"sector": "Old", "industry": "I"}}, ["A", "B"])
+    assert os.path.exists(checkpoint_path_for(str(tmp_path / "out.parquet")))
+
+    df = run(tmp_path, {"A": {"sector": "New", "industry": "I"}, "B": {"sector": "S", "industry": "I"}},
+             ["A", "B"], force=True)
+    assert sectors(df) == {"A": "New", "B": "S"}
+
+
+def test_checkpoint_of_other_input_is_ignored(tmp_path):
+    run(tmp_path, {"A": {"sector": "Old", "industry": "I"}}, ["A", "B"])
+    (tmp_path / "out.parquet").unlink()
+    (tmp_path / "reference.parquet").unlink()
+
+    df = run(tmp_path, {"A": {"sector": "New", "industry": "I"}, "C": {"sector": "S", "industry": "I"}},
+             ["A", "C"])
+    assert sectors(df) == {"A": "New", "C": "S"}
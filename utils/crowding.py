@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Subir la versión cada vez que cambien las fórmulas de compute_crowding
+CROWDING_VERSION = 1
+CROWDING_TOP_N = 10
+
+
+def _crowding_for_date(df):
+    """
+    Métricas de crowding por Ticker para una sola fecha de reporte:
+    - HHI: suma de las participaciones² de cada tenedor sobre las acciones institucionales del ticker
+    - Top 10 Share: fracción de esas acciones en manos de los 10 mayores tenedores
+    - Owner Overlap: coseno promedio entre las carteras (binarias) de cada par de tenedores del ticker
+    """
+    held = df[df["Shares Held"] > 0]
+    ticker_codes, tickers = pd.factorize(held["Ticker"], sort=True)
+    holder_codes, _ = pd.factorize(held["Owner Name"])
+    n_tickers = len(tickers)
+    if n_tickers == 0:
+        return pd.DataFrame(columns=["Ticker", "Holders", "HHI", "Top 10 Share", "Owner Overlap"])
+
+    # 🔹 Acciones por (ticker, tenedor), ordenadas por ticker y luego de mayor a menor
+    positions = pd.DataFrame({
+        "ticker": ticker_codes,
+        "holder": holder_codes,
+        "shares": held["Shares Held"].to_numpy(dtype=np.float64),
+    }).groupby(["ticker", "holder"], sort=False)["shares"].sum().reset_index()
+    positions = positions.sort_values(["ticker", "shares"], ascending=[True, False], kind="mergesort")
+    pos_tickers = positions["ticker"].to_numpy()
+    shares = positions["shares"].to_numpy()
+
+    totals = np.bincount(pos_tickers, weights=shares, minlength=n_tickers)
+    owners = np.bincount(pos_tickers, minlength=n_tickers)
+    weights = shares / totals[pos_tickers]
+    hhi = np.bincount(pos_tickers, weights=weights ** 2, minlength=n_tickers)
+    rank = positions.groupby("ticker", sort=False).cumcount().to_numpy()
+    top_share = np.bincount(pos_tickers, weights=np.where(rank < CROWDING_TOP_N, weights, 0), minlength=n_tickers)
+
+    # 🔹 Solapamiento: con N = filas de la matriz tenedor × ticker normalizadas (norma 1),
+    # la suma de N_i·N_j sobre todos los pares de tenedores de t es ||u_t||² - n_t,
+    # con u_t = Σ N_i, y todas las u_t salen de un único producto disperso Bᵀ·N
+    pos_holders = positions["holder"].to_numpy()
+    n_holders = pos_holders.max() + 1
+    presence = sparse.csr_matrix((np.ones(len(positions)), (pos_holders, pos_tickers)), shape=(n_holders, n_tickers))
+    portfolio_sizes = np.asarray(presence.sum(axis=1)).ravel()
+    normalized = sparse.diags(1.0 / np.sqrt(np.maximum(portfolio_sizes, 1))) @ presence
+    owner_sums = (presence.T @ normalized).tocsr()
+    squared_norms = np.asarray(owner_sums.multiply(owner_sums).sum(axis=1)).ravel()
+    pairs = owners * (owners - 1)
+    overlap = np.divide(squared_norms - owners, pairs, out=np.full(n_tickers, np.nan), where=pairs > 0)
+
+    return pd.DataFrame({
+        "Ticker": np.asarray(tickers),
+        "Holders": owners,
+        "HHI": hhi,
+        "Top 10 Share": top_share,
+        "Owner Overlap": overlap,
+    })
+
+
+def compute_crowding(merged_data):
+    """
+    Tabla de crowding por (Date, Ticker) para todo el universo. 'Crowding Score' (0-100)
+    es el promedio de los percentiles de HHI, Top 10 Share y Owner Overlap dentro de cada fecha.
+    """
+    tables = []
+    for date, group in merged_data.groupby("Date", sort=True):
+        table = _crowding_for_date(group)
+        if table.empty:
+            continue
+        components = table[["HHI", "Top 10 Share", "Owner Overlap"]].rank(pct=True)
+        table["Crowding Score"] = components.mean(axis=1) * 100
+        table.insert(0, "Date", date)
+        tables.append(table)
+    if not tables:
+        return pd.DataFrame(columns=["Date", "Ticker", "Holders", "HHI", "Top 10 Share", "Owner Overlap", "Crowding Score"])
+    return pd.concat(tables, ignore_index=True)
@@ -1,74 +1,111 @@
 import streamlit as st
 import pandas as pd
-import yfinance as yf
 import numpy as np
-import os
-from datetime import datetime
 
-@st.cache_data
-def load_data():
-    institutional_holders = pd.read_parquet("institutional_holders.parquet", engine="pyarrow")
-    general_data = pd.read_parquet("general_data_with_info.parquet", engine="pyarrow")
-    return institutional_holders, general_data
-
-
-MARKET_CAP_CACHE = "market_caps_cache.parquet"
-
-def load_market_caps_cache():
-    """Carga cache de market caps si existe y es del día de hoy."""
-    if os.path.exists(MARKET_CAP_CACHE):
-        try:
-            df = pd.read_parquet(MARKET_CAP_CACHE)
-            cached_date = df.attrs.get("date_cached", "")
-            today_str = datetime.today().strftime("%Y-%m-%d")
-            if cached_date == today_str:
-                # Convertir DataFrame a diccionario
-                return dict(zip(df['Ticker'], df['Market Cap']))
-        except Exception:
-            pass
-    return None
-
-def save_market_caps_cache(market_caps):
-    """Guarda market caps en disco con fecha de hoy."""
-    df = pd.DataFrame(list(market_caps.items()), columns=['Ticker', 'Market Cap'])
-    df.attrs["date_cached"] = datetime.today().strftime("%Y-%m-%d")
-    df.to_parquet(MARKET_CAP_CACHE)
+from utils.reference_data import reference_data
+
+HOLDERS_PATH = "institutional_holders.parquet"
+GENERAL_DATA_PATH = "general_data_with_info.parquet"
+
+# Columnas derivadas que toleran float32 (porcentajes y ratios; los valores en USD quedan en float64)
+FLOAT32_COLUMNS = [
+    "Total Shares Outstanding", "Institutional Ownership %",
+    "Percentage Owned", "Change as % of Market Cap", "Shares Change %",
+]
+INT64_COLUMNS = ["Shares Held", "Shares Change", "Previous Shares"]
+CATEGORY_COLUMNS = ["Ticker", "Owner Name", "Sector", "Industry"]
+
+
+def load_data(holders_path=HOLDERS_PATH, general_data_path=GENERAL_DATA_PATH):
+    institutional_holders = pd.read_parquet(holders_path, engine="pyarrow")
+    general_data = pd.read_parquet(general_data_path, engine="pyarrow")
+
+    # 🔹 Ticker con las mismas categorías en ambos frames: el merge se hace sobre códigos enteros
+    tickers = pd.Index(institutional_holders["Ticker"].unique()).union(general_data["Ticker"].unique())
+    ticker_dtype = pd.CategoricalDtype(tickers.astype(object))
+    institutional_holders["Ticker"] = institutional_holders["Ticker"].astype(object).astype(ticker_dtype)
+    general_data["Ticker"] = general_data["Ticker"].astype(object).astype(ticker_dtype)
+    return compact_dtypes(institutional_holders), compact_dtypes(general_data, downcast_floats=False)
+
+
+def compact_dtypes(df, downcast_floats=True):
+    """
+    Convierte strings repetidos a category, cantidades de acciones a int64 y
+    (si `downcast_floats`) ratios a float32.
+    """
+    df = df.copy()
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype(object).astype("category")
+    for col in INT64_COLUMNS:
+        if col in df.columns and df[col].notna().all() and (df[col] % 1 == 0).all():
+            df[col] = df[col].astype("int64")
+    for col in FLOAT32_COLUMNS if downcast_floats else []:
+        if col in df.columns:
+            df[col] = df[col].astype("float32")
+    return df
+
+
+def fill_missing_category(series, value):
+    """`fillna` que acepta columnas category agregando `value` como categoría si hace falta."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        if value not in series.cat.categories:
+            series = series.cat.add_categories([value])
+    return series.fillna(value)
+
+
+def memory_report(df):
+    """Memoria por columna (MB) y dtype, con una fila de total."""
+    usage = df.memory_usage(deep=True, index=False) / 1e6
+    report = pd.DataFrame({"dtype": df.dtypes.astype(str), "MB": usage})
+    report.loc["Total"] = ["", usage.sum()]
+    return report
+
+
+def refresh_market_caps(tickers):
+    """
+    Devuelve market caps vigentes del servicio de datos de referencia, consultando solo
+    los tickers vencidos o faltantes (el mismo request trae precio, sector e industria).
+    """
+    return reference_data.values(tickers, "Market Cap")
 
 
 @st.cache_data
 def get_market_caps(_tickers_list):
-    """Obtiene market caps en vivo usando cache diario."""
-
-    # Convertimos a lista normal
-    tickers = list(_tickers_list)
-
-    # Primero intentar cargar cache en disco
-    cached_caps = load_market_caps_cache()
-    if cached_caps:
-        # Filtrar solo los tickers solicitados
-        return {t: cached_caps[t] for t in tickers if t in cached_caps}
-
-    # Si no hay cache válido, consultar Yahoo Finance
-    market_caps = {}
-    for ticker in tickers:  # ← cambiado
-        try:
-            stock = yf.Ticker(ticker)
-            cap = stock.info.get('marketCap', None)
-            if cap:
-                market_caps[ticker] = cap
-        except Exception:
-            pass
-
-    # Guardar cache en disco
-    save_market_caps_cache(market_caps)
-    return market_caps
-@st.cache_data
-def preprocess_data(institutional_holders, general_data, live_market_caps=None):
+    """Obtiene market caps en vivo usando un cache por ticker con TTL."""
+    return refresh_market_caps(_tickers_list)
+
+
+def derive_position_columns(df):
     """
-    Preprocesa los datos combinando holders e información general.
-    Calcula Price per Share, valores individuales, cambios y asegura Sector/Industry.
+    Columnas derivadas de cada posición a partir de Shares Held, Shares Change y los datos
+    del ticker (Price per Share, Market Cap, Total Shares Outstanding). Modifica `df`.
     """
+    df["Percentage Owned"] = (df["Shares Held"] / (df["Total Shares Outstanding"] * 1e6)) * 100
+    df["Individual Holdings Value"] = df["Shares Held"] * df["Price per Share"] / 1e6
+    df["Change in Value"] = df["Shares Change"] * df["Price per Share"] / 1e6
+    df['Change as % of Market Cap'] = np.where(
+        df['Market Cap'] > 0,
+        (df['Change in Value'] * 1e6) / df['Market Cap'] * 100,
+        0
+    )
+
+    # 🔹 Porcentaje de cambio de shares
+    df["Previous Shares"] = df["Shares Held"] - df["Shares Change"]
+    df["Shares Change %"] = np.where(
+        df["Previous Shares"] != 0,
+        (df["Shares Change"] / df["Previous Shares"]) * 100,
+        np.inf
+    )
+
+    return df
 
+
+def prepare_general_data(general_data, live_market_caps=None):
+    """
+    Copia de `general_data` con Price per Share aproximado y Market Cap: el valor en vivo
+    si está en `live_market_caps`, si no Price per Share × Total Shares Outstanding.
+    """
     # 🔹 Calcular Price per Share aproximado
     general_data = general_data.copy()
     general_data["Price per Share"] = (general_data["Total Holdings Value"] * 1e6) / (
@@ -78,6 +115,7 @@ def preprocess_data(institutional_holders, general_data, live_market_caps=None):
     # 🔹 Merge de market caps en vivo si se proporcionan
     if live_market_caps:
         market_cap_df = pd.DataFrame(list(live_market_caps.items()), columns=['Ticker', 'Market Cap'])
+        market_cap_df['Ticker'] = market_cap_df['Ticker'].astype(general_data['Ticker'].dtype)
         general_data = pd.merge(general_data, market_cap_df, on='Ticker', how='left')
 
     # 🔹 Asegurar columna Market Cap
@@ -85,54 +123,52 @@ def preprocess_data(institutional_holders, general_data, live_market_caps=None):
         'Market Cap',
         general_data['Price per Share'] * general_data['Total Shares Outstanding'] * 1e6
     )
-    general_data['Market Cap'].fillna(
-        general_data['Price per Share'] * general_data['Total Shares Outstanding'] * 1e6,
-        inplace=True
+    general_data['Market Cap'] = general_data['Market Cap'].fillna(
+        general_data['Price per Share'] * general_data['Total Shares Outstanding'] * 1e6
     )
 
+    return general_data
+
+
+def build_merged_data(institutional_holders, general_data, live_market_caps=None):
+    """
+    Combina holders e información general y calcula todas las columnas derivadas:
+    Price per Share, Market Cap, valores individuales, cambios y Sector/Industry.
+    """
+    general_data = prepare_general_data(general_data, live_market_caps)
+
     # 🔹 Merge final con holders
     merged_data = pd.merge(institutional_holders, general_data, on="Ticker", how="left")
-    print(merged_data.head())
-    print(merged_data.columns)
+    merged_data['Date'] = pd.to_datetime(merged_data['Date'])
+    # 🔹 Ordenar por fecha: cada fecha de reporte queda en un rango contiguo de filas
+    merged_data = merged_data.sort_values('Date', kind='mergesort', ignore_index=True)
 
     # 🔹 Asegurarse de que existan las columnas Sector e Industry
     for col in ["Sector", "Industry"]:
         if col not in merged_data.columns:
             merged_data[col] = "Sin Datos"
         else:
-            merged_data[col] = merged_data[col].fillna("Sin Datos")
+            merged_data[col] = fill_missing_category(merged_data[col], "Sin Datos")
 
     # 🔹 Cálculos adicionales
-    merged_data["Percentage Owned"] = (merged_data["Shares Held"] / (merged_data["Total Shares Outstanding"] * 1e6)) * 100
-    merged_data["Individual Holdings Value"] = merged_data["Shares Held"] * merged_data["Price per Share"] / 1e6
-    merged_data['Date'] = pd.to_datetime(merged_data['Date'])
-    merged_data["Change in Value"] = merged_data["Shares Change"] * merged_data["Price per Share"] / 1e6
-    merged_data['Change as % of Market Cap'] = np.where(
-        merged_data['Market Cap'] > 0,
-        (merged_data['Change in Value'] * 1e6) / merged_data['Market Cap'] * 100,
-        0
-    )
-
-    # 🔹 Porcentaje de cambio de shares
-    merged_data["Previous Shares"] = merged_data["Shares Held"] - merged_data["Shares Change"]
-    merged_data["Shares Change %"] = np.where(
-        merged_data["Previous Shares"] != 0,
-        (merged_data["Shares Change"] / merged_data["Previous Shares"]) * 100,
-        np.inf
-    )
-    merged_data["Shares Change % num"] = merged_data["Shares Change %"]
-
-    # 🔹 Preparar versión para display
-    merged_data_display = merged_data.copy()
-    merged_data_display["Shares Change %"] = merged_data_display["Shares Change %"].apply(
-        lambda x: 'New Position' if np.isinf(x) else f"{x:.2f}%" if not np.isnan(x) else 'N/A'
-    )
-
-    return merged_data, merged_data_display
+    derive_position_columns(merged_data)
+    return compact_dtypes(merged_data)
 
 
+def format_shares_change_pct(x):
+    """Texto de `Shares Change %`: 'New Position' para posiciones nuevas (inf), 'N/A' si falta."""
+    return 'New Position' if np.isinf(x) else f"{x:.2f}%" if not np.isnan(x) else 'N/A'
 
 
+def style_holdings(df, display_cols):
+    """
+    Styler para tablas de tenencias. El formato de `Shares Change %` se aplica
+    al renderizar y solo sobre las filas recibidas, sin copiar el frame completo.
+    """
+    return df[display_cols].style.map(color_percentage, subset=["Shares Change %"]).format({
+        'Shares Change %': format_shares_change_pct,
+        'Change as % of Market Cap': '{:.4f}%',
+    })
 
 
 def color_percentage(val):
@@ -155,7 +191,7 @@ def color_percentage(val):
 def aggregate_by_sector_industry(merged_data, level="Sector"):
     """Agrega estadísticas por Sector o Industria."""
     group_stats = (
-        merged_data.groupby(level)
+        merged_data.groupby(level, observed=True)
         .agg({
             "Individual Holdings Value": "sum",
             "Percentage Owned": "mean",
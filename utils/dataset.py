@@ -0,0 +1,210 @@
+import threading
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.data_processing import load_data, get_market_caps, build_merged_data
+from utils.incremental import plan_refresh, apply_refresh, update_market_caps
+from utils.reference_data import reference_data
+from utils.etl import source_hash, is_merged_holdings_current, read_merged_holdings, read_merged_holdings_info, read_crowding
+from utils.crowding import compute_crowding
+from utils.position_diff import diff_positions
+from utils.holdings_cube import HoldingsCube
+from utils.flows import aggregate_flows
+from utils.ownership_index import OwnershipIndex
+from utils.similarity import HolderSimilarity
+
+
+class Dataset:
+    """
+    Datos ya combinados y derivados, compartidos por todas las páginas y sesiones.
+    Es de solo lectura: las páginas filtran o copian, nunca agregan columnas.
+    """
+
+    def __init__(self, merged_data, source=None):
+        # 🔹 Filas ordenadas por fecha: cada fecha ocupa un rango contiguo
+        if not merged_data['Date'].is_monotonic_increasing:
+            merged_data = merged_data.sort_values('Date', kind='mergesort', ignore_index=True)
+        self.merged_data = merged_data
+        # sha256 de los archivos de origen con los que se construyó (ver `source_hash`)
+        self.source = source
+        self.date_slices = self._build_date_slices(merged_data['Date'].to_numpy())
+        self.unique_dates = [date.date() for date in self.date_slices]
+        self._memo = {}
+
+    @staticmethod
+    def _build_date_slices(dates):
+        """Índice fecha → (inicio, fin) de su rango de filas."""
+        if len(dates) == 0:
+            return {}
+        starts = np.concatenate(([0], np.flatnonzero(dates[1:] != dates[:-1]) + 1))
+        stops = np.append(starts[1:], len(dates))
+        return {pd.Timestamp(dates[start]): (start, stop) for start, stop in zip(starts, stops)}
+
+    def for_date(self, date=None):
+        """
+        Filas de una fecha de reporte como slice sin copia; con `date=None`
+        devuelve el frame completo.
+        """
+        if date is None:
+            return self.merged_data
+        start, stop = self.date_slices.get(pd.Timestamp(date), (0, 0))
+        return self.merged_data.iloc[start:stop]
+
+    def memoize(self, key, build):
+        """Calcula `build()` una sola vez por proceso para `key` y lo comparte entre sesiones."""
+        if key not in self._memo:
+            self._memo[key] = build()
+        return self._memo[key]
+
+    def flows(self, date=None):
+        """Métricas de flujo por Ticker (ver `aggregate_flows`) para el filtro de fecha dado."""
+        date = pd.Timestamp(date) if date is not None else None
+        return self.memoize(('flows', date), lambda: aggregate_flows(self.for_date(date)))
+
+    def ownership(self, date=None):
+        """Índice invertido ticker ↔ tenedor (ver `OwnershipIndex`) para el filtro de fecha dado."""
+        date = pd.Timestamp(date) if date is not None else None
+        return self.memoize(('ownership', date), lambda: OwnershipIndex(self.for_date(date)))
+
+    def similarity(self, date=None, weight_column="Individual Holdings Value"):
+        """Matriz de similitud entre carteras (ver `HolderSimilarity`) para el filtro de fecha y peso dados."""
+        date = pd.Timestamp(date) if date is not None else None
+        return self.memoize(('similarity', date, weight_column),
+                            lambda: HolderSimilarity(self.for_date(date), weight_column))
+
+    def diff(self, old_date, new_date):
+        """Cambios calculados entre dos fechas de reporte (ver `diff_positions`)."""
+        old_date, new_date = pd.Timestamp(old_date), pd.Timestamp(new_date)
+        return self.memoize(('diff', old_date, new_date),
+                            lambda: diff_positions(self.for_date(old_date), self.for_date(new_date), new_date))
+
+    def diff_flows(self, old_date, new_date):
+        """Métricas de flujo por Ticker sobre los cambios calculados entre dos fechas."""
+        old_date, new_date = pd.Timestamp(old_date), pd.Timestamp(new_date)
+        return self.memoize(('diff_flows', old_date, new_date),
+                            lambda: aggregate_flows(self.diff(old_date, new_date)))
+
+    def cube(self, date=None):
+        """Cubo fecha × tenedor × ticker con rollups (ver `HoldingsCube`) para el filtro de fecha dado."""
+        date = pd.Timestamp(date) if date is not None else None
+        return self.memoize(('cube', date), lambda: HoldingsCube(self.for_date(date)))
+
+    def crowding(self):
+        """Crowding por (Date, Ticker) de todo el universo (ver `compute_crowding`)."""
+        return self.memoize(('crowding',), lambda: compute_crowding(self.merged_data))
+
+
+_dataset = None
+_dataset_lock = threading.Lock()
+
+
+def current_source_hash():
+    """`source_hash()` de los archivos de entrada; None si no están (deploy solo con el parquet construido)."""
+    try:
+        return source_hash()
+    except FileNotFoundError:
+        return None
+
+
+def with_live_market_caps(merged_data):
+    """Reemplaza los market caps del dataset por los vigentes del servicio de referencia."""
+    live_market_caps = get_market_caps(merged_data['Ticker'].astype(str).unique())
+    if not live_market_caps:
+        return merged_data
+    return update_market_caps(merged_data, pd.Series(live_market_caps, dtype="float64"))[0]
+
+
+def build_dataset(rebuild=False):
+    """
+    Usa `merged_holdings.parquet` si está al día (ver `build_merged_holdings.py`) y no se
+    pide `rebuild`; si no, carga los parquet, obtiene market caps y ejecuta el
+    preprocesamiento completo. Sin archivos fuente (deploy solo con el parquet construido)
+    `rebuild` recarga el parquet con los market caps vigentes.
+    """
+    source = current_source_hash()
+    if source is None and rebuild:
+        return Dataset(with_live_market_caps(read_merged_holdings()), source)
+    if not rebuild and is_merged_holdings_current():
+        dataset = Dataset(read_merged_holdings(), source)
+        # 🔹 Crowding precalculado por build_merged_holdings.py, si corresponde a este parquet
+        crowding = read_crowding(read_merged_holdings_info())
+        if crowding is not None:
+            dataset.memoize(('crowding',), lambda: crowding)
+        return dataset
+
+    institutional_holders, general_data = load_data()
+    if institutional_holders.empty or general_data.empty:
+        raise ValueError("Uno o ambos archivos parquet están vacíos.")
+    live_market_caps = get_market_caps(general_data['Ticker'].unique())
+    return Dataset(build_merged_data(institutional_holders, general_data, live_market_caps), source)
+
+
+def get_dataset():
+    """
+    Devuelve el dataset del proceso, construyéndolo una sola vez. Al construirlo arranca
+    el prefetch de precios de sus tickers, para que las páginas lean todo del cache.
+    """
+    global _dataset
+    if _dataset is None:
+        with _dataset_lock:
+            if _dataset is None:
+                _dataset = build_dataset()
+                reference_data.start_prefetch(_dataset.merged_data['Ticker'].unique())
+    return _dataset
+
+
+def reset_dataset():
+    """Descarta el dataset actual; el próximo `get_dataset()` lo reconstruye."""
+    global _dataset
+    with _dataset_lock:
+        _dataset = None
+
+
+def refresh_dataset(full=False):
+    """
+    Regenera el dataset haciendo solo el trabajo necesario (ver `plan_refresh`):
+    si solo cambiaron market caps se actualizan esas columnas, si solo llegaron filas
+    de holders nuevas se combinan y derivan esas filas; cualquier otro cambio (o `full=True`)
+    reconstruye todo desde los archivos fuente, sin usar el parquet construido.
+    Devuelve un dict con 'mode' y el resumen de lo aplicado.
+    """
+    global _dataset
+    get_market_caps.clear()
+    with _dataset_lock:
+        current = _dataset
+        source = current_source_hash()
+        # 🔹 Sin archivos fuente no hay contra qué comparar: se recarga el parquet construido
+        if full or current is None or source is None:
+            _dataset = build_dataset(rebuild=full or source is None)
+            return {"mode": "full"}
+
+        institutional_holders, general_data = load_data()
+        if institutional_holders.empty or general_data.empty:
+            raise ValueError("Uno o ambos archivos parquet están vacíos.")
+        live_market_caps = get_market_caps(general_data['Ticker'].unique())
+        plan = plan_refresh(current.merged_data, institutional_holders, general_data, live_market_caps,
+                            sources_changed=source != current.source)
+        if plan["mode"] == "full":
+            _dataset = Dataset(build_merged_data(institutional_holders, general_data, live_market_caps), source)
+            return plan
+        if plan["mode"] == "none":
+            current.source = source
+            return {"mode": "none"}
+
+        merged_data, summary = apply_refresh(current.merged_data, plan, institutional_holders,
+                                             general_data, live_market_caps)
+        # 🔹 Dataset nuevo: los memos (flujos, cubos, índices) se recalculan a demanda
+        _dataset = Dataset(merged_data, source)
+        return {"mode": "incremental", **summary}
+
+
+def require_dataset():
+    """Versión para páginas: muestra el error y detiene la página si los datos no cargan."""
+    try:
+        with st.spinner('Cargando datos...'):
+            return get_dataset()
+    except Exception as e:
+        st.error(f"Datos no cargados. Por favor, revisa la página principal. Detalles: {str(e)}")
+        st.stop()
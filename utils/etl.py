@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from utils.data_processing import (
+    HOLDERS_PATH,
+    GENERAL_DATA_PATH,
+    load_data,
+    refresh_market_caps,
+    build_merged_data,
+)
+from utils.crowding import CROWDING_VERSION, compute_crowding
+
+MERGED_HOLDINGS_PATH = "merged_holdings.parquet"
+# Subir la versión cada vez que cambie el esquema o las fórmulas de build_merged_data
+MERGED_HOLDINGS_VERSION = 5
+METADATA_KEY = b"institucionales"
+# Tabla de crowding por ticker, derivada de merged_holdings y guardada junto a él
+CROWDING_PATH = "ticker_crowding.parquet"
+
+
+def source_hash(paths=(HOLDERS_PATH, GENERAL_DATA_PATH)):
+    """sha256 de los archivos de entrada, para detectar un parquet construido con datos viejos."""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_hash(df):
+    """sha256 del contenido del frame (independiente del encoding del parquet)."""
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha256(row_hashes.tobytes())
+    digest.update(",".join(df.columns).encode())
+    return digest.hexdigest()
+
+
+def _write_with_metadata(df, path, info):
+    """Escribe `df` con `info` (JSON) en la metadata del esquema; escritura atómica."""
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata[METADATA_KEY] = json.dumps(info).encode()
+    table = table.replace_schema_metadata(schema_metadata)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _read_info(path):
+    """Lee solo la metadata propia de un parquet sin cargar los datos; None si no existe."""
+    if not os.path.exists(path):
+        return None
+    metadata = pq.read_schema(path).metadata or {}
+    if METADATA_KEY not in metadata:
+        return None
+    return json.loads(metadata[METADATA_KEY])
+
+
+def write_merged_holdings(merged_data, path=MERGED_HOLDINGS_PATH, metadata=None):
+    """Guarda el frame derivado con versión y hashes en la metadata del parquet (escritura atómica)."""
+    info = {
+        "version": MERGED_HOLDINGS_VERSION,
+        "content_hash": content_hash(merged_data),
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "rows": len(merged_data),
+    }
+    info.update(metadata or {})
+    _write_with_metadata(merged_data, path, info)
+    return info
+
+
+def read_merged_holdings_info(path=MERGED_HOLDINGS_PATH):
+    """Lee solo la metadata (versión, hashes) sin cargar los datos; None si no existe."""
+    return _read_info(path)
+
+
+def read_merged_holdings(path=MERGED_HOLDINGS_PATH):
+    """
+    Lee el parquet derivado (memory-map evita copiar el archivo al leerlo). `to_pandas`
+    igual copia a bloques de pandas; con self_destruct cada columna de Arrow se libera
+    al convertirla, así el pico de memoria no llega a tabla + DataFrame completos.
+    """
+    table = pq.read_table(path, memory_map=True)
+    return table.to_pandas(self_destruct=True, split_blocks=True)
+
+
+def is_merged_holdings_current(path=MERGED_HOLDINGS_PATH):
+    """True si el parquet existe, tiene la versión actual y se construyó con los archivos de entrada actuales."""
+    info = read_merged_holdings_info(path)
+    if info is None or info.get("version") != MERGED_HOLDINGS_VERSION:
+        return False
+    try:
+        return info.get("source_hash") == source_hash()
+    except FileNotFoundError:
+        # Sin archivos fuente en el servidor: se confía en el parquet construido
+        return True
+
+
+def write_crowding(crowding, merged_info, path=CROWDING_PATH):
+    """Guarda la tabla de crowding atada al `content_hash` del merged_holdings del que se derivó."""
+    info = {
+        "crowding_version": CROWDING_VERSION,
+        "merged_content_hash": merged_info["content_hash"],
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "rows": len(crowding),
+    }
+    _write_with_metadata(crowding, path, info)
+    return info
+
+
+def read_crowding(merged_info, path=CROWDING_PATH):
+    """Tabla de crowding guardada si corresponde a `merged_info` y a la versión actual; si no, None."""
+    info = _read_info(path)
+    if (merged_info is None or info is None
+            or info.get("crowding_version") != CROWDING_VERSION
+            or info.get("merged_content_hash") != merged_info.get("content_hash")):
+        return None
+    return pq.read_table(path).to_pandas()
+
+
+def build_merged_holdings(path=MERGED_HOLDINGS_PATH, with_market_caps=True, crowding_path=CROWDING_PATH):
+    """
+    Ejecuta el pipeline completo y materializa el resultado en `path`, junto con la
+    tabla de crowding en `crowding_path`. Devuelve (metadata, frame).
+    """
+    institutional_holders, general_data = load_data()
+    live_market_caps = refresh_market_caps(general_data["Ticker"].unique()) if with_market_caps else None
+    merged_data = build_merged_data(institutional_holders, general_data, live_market_caps)
+    info = write_merged_holdings(merged_data, path, metadata={
+        "source_hash": source_hash(),
+        "market_caps": len(live_market_caps or {}),
+    })
+    crowding_info = write_crowding(compute_crowding(merged_data), info, crowding_path)
+    info["crowding_rows"] = crowding_info["rows"]
+    return info, merged_data
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+
+# Categorías de movimiento (excluyentes entre sí)
+FLOW_CATEGORIES = ["new", "increased", "decreased", "closed"]
+FLOW_OTHER = len(FLOW_CATEGORIES)
+# Signo del cambio de acciones
+FLOW_SIGNS = ["neutral", "positive", "negative"]
+
+
+def classify_flows(df):
+    """
+    Código de categoría por fila (índice en FLOW_CATEGORIES, o FLOW_OTHER):
+    - new: Previous Shares == 0 (Shares Change % infinito)
+    - increased: Shares Change > 0 y Previous Shares > 0
+    - decreased: Shares Change < 0 y Shares Held > 0
+    - closed: Shares Held == 0 y Previous Shares > 0
+    """
+    change = df["Shares Change"].to_numpy()
+    held = df["Shares Held"].to_numpy()
+    previous = df["Previous Shares"].to_numpy()
+    return np.select(
+        [previous == 0, (change > 0) & (previous > 0), (change < 0) & (held > 0), (held == 0) & (previous > 0)],
+        [0, 1, 2, 3],
+        default=FLOW_OTHER,
+    ).astype(np.int64)
+
+
+def classify_signs(df):
+    """Código de signo por fila (índice en FLOW_SIGNS); NaN cuenta como neutral."""
+    change = df["Shares Change"].to_numpy()
+    return np.select([change > 0, change < 0], [1, 2], default=0).astype(np.int64)
+
+
+def aggregate_flows(df):
+    """
+    Agrega en una sola pasada, por Ticker, todas las métricas de flujo:
+    `{cat}_rows`, `{cat}_holders` (tenedores únicos), `{cat}_value` (Change in Value)
+    y `{cat}_mc` (Change as % of Market Cap) para cada categoría de FLOW_CATEGORIES,
+    las mismas sumas para `positive`/`negative` y el neto `net_value`/`net_mc`.
+    """
+    ticker_codes, tickers = pd.factorize(df["Ticker"], sort=True)
+    owner_codes, _ = pd.factorize(df["Owner Name"])
+    n_cells = len(FLOW_CATEGORIES) + 1
+    n_signs = len(FLOW_SIGNS)
+
+    # 🔹 Una clave entera por (ticker, categoría, signo): todas las sumas salen de bincount
+    cell = classify_flows(df) * n_signs + classify_signs(df)
+    key = ticker_codes.astype(np.int64) * (n_cells * n_signs) + cell
+    minlength = len(tickers) * n_cells * n_signs
+
+    # Primera aparición de cada (ticker, categoría, tenedor) → cuenta de tenedores únicos
+    group = ticker_codes.astype(np.int64) * n_cells + cell // n_signs
+    first_holder = ~pd.DataFrame({"group": group, "owner": owner_codes}).duplicated().to_numpy()
+
+    def cube(weights=None):
+        sums = np.bincount(key, weights=weights, minlength=minlength)
+        return sums.reshape(len(tickers), n_cells, n_signs)
+
+    rows = cube()
+    holders = cube(first_holder.astype(np.float64))
+    value = cube(np.nan_to_num(df["Change in Value"].to_numpy(dtype=np.float64)))
+    mc = cube(np.nan_to_num(df["Change as % of Market Cap"].to_numpy(dtype=np.float64)))
+
+    result = {"Ticker": np.asarray(tickers)}
+    for i, category in enumerate(FLOW_CATEGORIES):
+        result[f"{category}_rows"] = rows[:, i, :].sum(axis=1).astype(np.int64)
+        result[f"{category}_holders"] = holders[:, i, :].sum(axis=1).astype(np.int64)
+        result[f"{category}_value"] = value[:, i, :].sum(axis=1)
+        result[f"{category}_mc"] = mc[:, i, :].sum(axis=1)
+    for j, sign in enumerate(FLOW_SIGNS[1:], start=1):
+        result[f"{sign}_rows"] = rows[:, :, j].sum(axis=1).astype(np.int64)
+        result[f"{sign}_value"] = value[:, :, j].sum(axis=1)
+        result[f"{sign}_mc"] = mc[:, :, j].sum(axis=1)
+    result["net_value"] = value.sum(axis=(1, 2))
+    result["net_mc"] = mc.sum(axis=(1, 2))
+    return pd.DataFrame(result)
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Métricas sumables que guarda el cubo
+CUBE_METRICS = ["Shares Held", "Shares Change", "Previous Shares", "Individual Holdings Value", "Change in Value"]
+MISSING_SECTOR = "Sin Datos"
+
+
+class HoldingsCube:
+    """
+    Cubo fecha × tenedor × ticker con las métricas de CUBE_METRICS, guardado como una
+    matriz dispersa por métrica (filas = tenedor, columnas = fecha · n_tickers + ticker),
+    más rollups densos por tenedor, ticker, sector y fecha. Las series de tendencia
+    son cortes de esos arrays, sin filtrar ni ordenar la tabla.
+    """
+
+    def __init__(self, df):
+        date_codes, dates = pd.factorize(df["Date"], sort=True)
+        holder_codes, holders = pd.factorize(df["Owner Name"], sort=True)
+        ticker_codes, tickers = pd.factorize(df["Ticker"], sort=True)
+        self.dates = pd.DatetimeIndex(dates)
+        self.holders = pd.Index(np.asarray(holders, dtype=object), name="Owner Name")
+        self.tickers = pd.Index(np.asarray(tickers, dtype=object), name="Ticker")
+        n_dates, n_holders, n_tickers = len(self.dates), len(self.holders), len(self.tickers)
+
+        # 🔹 Sector de cada fila (los faltantes van a MISSING_SECTOR)
+        sector_source = df["Sector"] if "Sector" in df.columns else pd.Series(MISSING_SECTOR, index=df.index)
+        sector_codes, sectors = pd.factorize(sector_source, sort=True)
+        sectors = list(sectors)
+        if (sector_codes < 0).any():
+            if MISSING_SECTOR not in sectors:
+                sectors.append(MISSING_SECTOR)
+            sector_codes = np.where(sector_codes < 0, sectors.index(MISSING_SECTOR), sector_codes)
+        self.sectors = pd.Index(np.asarray(sectors, dtype=object), name="Sector")
+        n_sectors = len(self.sectors)
+
+        columns = date_codes.astype(np.int64) * n_tickers + ticker_codes
+        shape = (n_holders, n_dates * n_tickers)
+        holder_cells = date_codes.astype(np.int64) * n_holders + holder_codes
+        ticker_cells = date_codes.astype(np.int64) * n_tickers + ticker_codes
+        sector_cells = date_codes.astype(np.int64) * n_sectors + sector_codes
+
+        self.cells = {}
+        self.by_holder = {}
+        self.by_ticker = {}
+        self.by_sector = {}
+        self.by_date = {}
+        for metric in CUBE_METRICS + ["Rows"]:
+            if metric == "Rows":
+                values = np.ones(len(df))
+            elif metric in df.columns:
+                values = np.nan_to_num(df[metric].to_numpy(dtype=np.float64, na_value=np.nan))
+            else:
+                continue
+            # coo → csr suma las filas repetidas de la misma celda
+            self.cells[metric] = sparse.coo_matrix((values, (holder_codes, columns)), shape=shape).tocsr()
+            self.by_holder[metric] = np.bincount(holder_cells, values, n_dates * n_holders).reshape(n_dates, n_holders)
+            self.by_ticker[metric] = np.bincount(ticker_cells, values, n_dates * n_tickers).reshape(n_dates, n_tickers)
+            self.by_sector[metric] = np.bincount(sector_cells, values, n_dates * n_sectors).reshape(n_dates, n_sectors)
+            self.by_date[metric] = np.bincount(date_codes, values, n_dates)
+
+        self._holder_ids = {name: i for i, name in enumerate(self.holders)}
+        self._ticker_ids = {name: i for i, name in enumerate(self.tickers)}
+        self._sector_ids = {name: i for i, name in enumerate(self.sectors)}
+
+    # === Series de tendencia (una entrada por fecha) ===
+    def _trend(self, rollup, ids, name, metric):
+        i = ids.get(name)
+        values = rollup[metric][:, i] if i is not None else np.zeros(len(self.dates))
+        return pd.Series(values, index=self.dates, name=metric)
+
+    def holder_trend(self, holder, metric):
+        return self._trend(self.by_holder, self._holder_ids, holder, metric)
+
+    def ticker_trend(self, ticker, metric):
+        return self._trend(self.by_ticker, self._ticker_ids, ticker, metric)
+
+    def sector_trend(self, sector, metric):
+        return self._trend(self.by_sector, self._sector_ids, sector, metric)
+
+    def date_totals(self, metric):
+        return pd.Series(self.by_date[metric], index=self.dates, name=metric)
+
+    def holder_active_dates(self, holder):
+        """Fechas en las que `holder` tiene al menos una fila."""
+        rows = self.holder_trend(holder, "Rows")
+        return rows[rows > 0].index
+
+    def holder_change_pct_trend(self, holder):
+        """Cambio % agregado por fecha: Σ Shares Change / Σ Previous Shares · 100 (NaN sin posiciones previas)."""
+        change = self.holder_trend(holder, "Shares Change")
+        previous = self.holder_trend(holder, "Previous Shares")
+        return (change / previous.where(previous != 0) * 100).rename("Shares Change %")
+
+    # === Cortes por tenedor ===
+    def holder_positions(self, holder, metric):
+        """Matriz Ticker × Fecha de `metric` para `holder` (solo tickers con alguna fila)."""
+        i = self._holder_ids.get(holder)
+        if i is None:
+            return pd.DataFrame(columns=self.dates)
+        values = self.cells[metric][i].toarray().reshape(len(self.dates), len(self.tickers))
+        present = self.cells["Rows"][i].toarray().reshape(len(self.dates), len(self.tickers)).any(axis=0)
+        return pd.DataFrame(values[:, present].T, index=self.tickers[present], columns=self.dates)
+
+    def holder_ticker_count(self, holder):
+        """Cantidad de tickers distintos de `holder` en cualquier fecha."""
+        i = self._holder_ids.get(holder)
+        if i is None:
+            return 0
+        row = self.cells["Rows"][i]
+        return len(np.unique(row.indices % len(self.tickers)))
+
+    def holder_total(self, holder, metric):
+        """Suma de `metric` de `holder` sobre todas las fechas."""
+        return float(self.holder_trend(holder, metric).sum())
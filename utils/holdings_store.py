@@ -0,0 +1,149 @@
+import glob
+import os
+import uuid
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+STORE_PATH = "holdings_store"
+# Exportaciones fechadas: institutional_holders_all_YYYYMMDD_HHMMSS.csv
+SNAPSHOT_PATTERN = "institutional_holders_all_*.csv"
+SHARES_MULTIPLIERS = {"": 1.0, "K": 1e-3, "M": 1.0, "B": 1e3}
+STORE_KEY = ["Holder", "Ticker", "Date Reported"]
+PARTITIONING = ds.partitioning(pa.schema([("report_date", pa.string())]), flavor="hive")
+
+
+def parse_shares_to_millions(shares):
+    """
+    Convierte la columna Shares ("16.3M", "850k", "1.2B" o números) a millones de acciones,
+    extrayendo número y sufijo de toda la columna a la vez.
+    """
+    parts = shares.astype(str).str.strip().str.extract(r"^([-+]?[\d.,]+)\s*([kKmMbB]?)$")
+    numbers = pd.to_numeric(parts[0].str.replace(",", "", regex=False), errors="coerce")
+    multipliers = parts[1].str.upper().map(SHARES_MULTIPLIERS)
+    return numbers * multipliers
+
+
+def parse_holders_csv(csv_path):
+    """Lee una exportación CSV con tipos explícitos y convierte Shares, % Out, Value y fechas sin `.apply`."""
+    df = pd.read_csv(csv_path, dtype={
+        "Holder": "string",
+        "Shares": "string",
+        "Date Reported": "string",
+        "% Out": "string",
+        "Ticker": "string",
+        "Fetch_Date": "string",
+    })
+    df["Shares"] = parse_shares_to_millions(df["Shares"])
+    df["% Out"] = pd.to_numeric(df["% Out"].str.rstrip("%"), errors="coerce").astype("float64")
+    df["Value"] = pd.to_numeric(df["Value"], errors="coerce")
+    df["Date Reported"] = pd.to_datetime(df["Date Reported"], format="%b %d, %Y", errors="coerce")
+    df["Fetch_Date"] = pd.to_datetime(df["Fetch_Date"], format="%Y-%m-%d", errors="coerce")
+    return df
+
+
+def find_snapshots(pattern=SNAPSHOT_PATTERN):
+    """Exportaciones disponibles, de la más vieja a la más nueva (el nombre lleva la fecha)."""
+    return sorted(glob.glob(pattern))
+
+
+def _dedup_latest_fetch(df):
+    """Una fila por (Holder, Ticker, Date Reported): la del Fetch_Date más reciente."""
+    return (df.sort_values("Fetch_Date", kind="mergesort")
+              .drop_duplicates(STORE_KEY, keep="last")
+              .reset_index(drop=True))
+
+
+class HoldingsStore:
+    """
+    Histórico de exportaciones, solo de agregado y particionado por fecha de reporte
+    (`report_date=YYYY-MM-DD/part-*.parquet`). Cada ingesta agrega archivos nuevos;
+    las filas repetidas por (Holder, Ticker, Date Reported) se resuelven por Fetch_Date.
+    """
+
+    def __init__(self, root=STORE_PATH):
+        self.root = root
+
+    def _dataset(self):
+        files = glob.glob(os.path.join(self.root, "report_date=*", "*.parquet"))
+        if not files:
+            return None
+        return ds.dataset(files, format="parquet", partitioning=PARTITIONING, partition_base_dir=self.root)
+
+    def report_dates(self):
+        """Fechas de reporte presentes, leídas de los nombres de partición (sin abrir archivos)."""
+        prefix = "report_date="
+        dates = [name[len(prefix):] for name in os.listdir(self.root) if name.startswith(prefix)] \
+            if os.path.isdir(self.root) else []
+        return sorted(pd.Timestamp(date) for date in dates)
+
+    def version(self):
+        """Cambia con cada ingesta; sirve como clave de caché."""
+        files = glob.glob(os.path.join(self.root, "report_date=*", "*.parquet"))
+        return len(files), max((os.stat(f).st_mtime_ns for f in files), default=0)
+
+    def _existing_keys(self, report_dates):
+        """Claves y Fetch_Date ya guardados, leyendo solo las particiones indicadas."""
+        dataset = self._dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=STORE_KEY + ["Fetch_Date"])
+        table = dataset.to_table(columns=STORE_KEY + ["Fetch_Date"],
+                                 filter=ds.field("report_date").isin(report_dates))
+        return table.to_pandas()
+
+    def ingest(self, df, source):
+        """
+        Agrega las filas de `df` que no estén ya guardadas con un Fetch_Date igual o más
+        reciente. Devuelve la cantidad de filas escritas.
+        """
+        df = _dedup_latest_fetch(df.dropna(subset=["Date Reported"]))
+        df["Source"] = os.path.basename(source)
+        report_dates = df["Date Reported"].dt.strftime("%Y-%m-%d")
+
+        # 🔹 Solo se consultan las particiones que toca esta exportación
+        existing = self._existing_keys(sorted(report_dates.unique()))
+        if not existing.empty:
+            latest = existing.groupby(STORE_KEY)["Fetch_Date"].max().rename("Stored_Fetch")
+            stored = df.join(latest, on=STORE_KEY)["Stored_Fetch"]
+            keep = stored.isna() | (df["Fetch_Date"] > stored)
+            df, report_dates = df[keep], report_dates[keep]
+
+        written = 0
+        for report_date, rows in df.groupby(report_dates, sort=True):
+            partition = os.path.join(self.root, f"report_date={report_date}")
+            os.makedirs(partition, exist_ok=True)
+            name = f"part-{uuid.uuid4().hex}.parquet"
+            tmp_path = os.path.join(partition, f".{name}.tmp")
+            pq.write_table(pa.Table.from_pandas(rows, preserve_index=False), tmp_path)
+            os.replace(tmp_path, os.path.join(partition, name))
+            written += len(rows)
+        return written
+
+    def ingest_csv(self, csv_path):
+        return self.ingest(parse_holders_csv(csv_path), csv_path)
+
+    def latest_as_of(self, as_of=None, columns=None):
+        """
+        Cartera de cada Holder según su último reporte con Date Reported <= `as_of` (todas
+        las fechas si es None): las posiciones que ya no figuran en ese reporte se cerraron
+        y no vuelven desde reportes anteriores. El filtro se aplica sobre las particiones,
+        así que las fechas posteriores ni se abren.
+        """
+        dataset = self._dataset()
+        if dataset is None:
+            return pd.DataFrame(columns=columns or [])
+        read_columns = None
+        if columns is not None:
+            read_columns = list(dict.fromkeys(list(columns) + STORE_KEY + ["Fetch_Date"]))
+        predicate = None
+        if as_of is not None:
+            predicate = ds.field("report_date") <= pd.Timestamp(as_of).strftime("%Y-%m-%d")
+        df = dataset.to_table(columns=read_columns, filter=predicate).to_pandas()
+        df = df.drop(columns=["report_date"], errors="ignore")
+        df = _dedup_latest_fetch(df)
+        # 🔹 Solo las filas del último reporte de cada tenedor
+        latest_report = df.groupby("Holder")["Date Reported"].transform("max")
+        df = df[df["Date Reported"] == latest_report].reset_index(drop=True)
+        return df[columns] if columns is not None else df
@@ -0,0 +1,130 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from utils.data_processing import CATEGORY_COLUMNS, build_merged_data, prepare_general_data
+
+# Columnas de institutional_holders que identifican una fila de origen
+HOLDER_COLUMNS = ["Ticker", "Owner Name", "Date", "Shares Held", "Shares Change"]
+# Columnas de general_data que, si cambian, obligan a reconstruir todo
+GENERAL_COLUMNS = ["Total Shares Outstanding", "Institutional Ownership %", "Total Holdings Value"]
+
+
+def holder_row_hashes(df):
+    """
+    Hash por fila de las columnas de HOLDER_COLUMNS, independiente de dtypes
+    (category/string dan el mismo hash; los números se pasan a float64), para comparar
+    el archivo de holders con el dataset ya construido.
+    """
+    key = pd.DataFrame({
+        "Ticker": df["Ticker"],
+        "Owner Name": df["Owner Name"],
+        "Date": pd.to_datetime(df["Date"]).to_numpy(),
+        "Shares Held": df["Shares Held"].to_numpy(dtype=np.float64, na_value=np.nan),
+        "Shares Change": df["Shares Change"].to_numpy(dtype=np.float64, na_value=np.nan),
+    }, index=df.index)
+    return pd.util.hash_pandas_object(key, index=False).to_numpy()
+
+
+def _contains(values, table):
+    """Máscara `values ∈ table`: ambos ordenados y búsqueda binaria (mucho más rápido que np.isin con hashes)."""
+    if len(table) == 0:
+        return np.zeros(len(values), dtype=bool)
+    table = np.sort(table)
+    order = np.argsort(values)
+    pos = np.minimum(np.searchsorted(table, values[order]), len(table) - 1)
+    found = np.empty(len(values), dtype=bool)
+    found[order] = table[pos] == values[order]
+    return found
+
+
+def _per_ticker(df, columns):
+    """Primera fila de cada ticker con `columns` (float32 para comparar sin ruido de precisión)."""
+    per_ticker = df.drop_duplicates("Ticker")
+    return per_ticker.set_index(per_ticker["Ticker"].astype(str))[columns].astype("float32")
+
+
+def general_data_changed(merged_data, general_data):
+    """True si algún dato general de un ticker presente en el dataset difiere del archivo."""
+    current = _per_ticker(merged_data, GENERAL_COLUMNS)
+    incoming = _per_ticker(general_data, GENERAL_COLUMNS).reindex(current.index)
+    same = np.isclose(current.to_numpy(), incoming.to_numpy(), rtol=1e-6, equal_nan=True)
+    return not same.all()
+
+
+def changed_market_caps(merged_data, general_data, live_market_caps):
+    """Market Cap vigente de los tickers cuyo valor difiere del que tiene el dataset."""
+    market_caps = prepare_general_data(general_data, live_market_caps)
+    market_caps = market_caps.set_index(market_caps["Ticker"].astype(str))["Market Cap"]
+    current = merged_data.drop_duplicates("Ticker")
+    current = current.set_index(current["Ticker"].astype(str))["Market Cap"].astype("float64")
+    incoming = market_caps.reindex(current.index).astype("float64")
+    changed = ~np.isclose(current.to_numpy(), incoming.to_numpy(), rtol=1e-9, equal_nan=True)
+    return incoming[changed]
+
+
+def plan_refresh(merged_data, institutional_holders, general_data, live_market_caps, sources_changed=True):
+    """
+    Compara el dataset construido con las entradas actuales y decide el trabajo mínimo:
+    - 'full': cambió general_data o desaparecieron filas de holders
+    - 'incremental': solo hay filas de holders nuevas y/o market caps distintos
+    - 'none': nada cambió
+    Con `sources_changed=False` (mismos archivos de origen) solo se comparan los market caps.
+    Devuelve un dict con 'mode', 'new_rows' (máscara sobre institutional_holders)
+    y 'market_caps' (Series Ticker → Market Cap a actualizar).
+    """
+    if not sources_changed:
+        market_caps = changed_market_caps(merged_data, general_data, live_market_caps)
+        return {"mode": "incremental" if len(market_caps) else "none",
+                "new_rows": np.zeros(len(institutional_holders), dtype=bool), "market_caps": market_caps}
+
+    if general_data_changed(merged_data, general_data):
+        return {"mode": "full", "reason": "general_data"}
+
+    current_hashes = holder_row_hashes(merged_data)
+    incoming_hashes = holder_row_hashes(institutional_holders)
+    if not _contains(current_hashes, incoming_hashes).all():
+        return {"mode": "full", "reason": "holders"}
+    new_rows = ~_contains(incoming_hashes, current_hashes)
+
+    market_caps = changed_market_caps(merged_data, general_data, live_market_caps)
+    mode = "incremental" if new_rows.any() or len(market_caps) else "none"
+    return {"mode": mode, "new_rows": new_rows, "market_caps": market_caps}
+
+
+def _concat_with_categories(frames):
+    """concat que conserva las columnas category uniendo sus categorías."""
+    frames = [frame for frame in frames if len(frame)]
+    for col in CATEGORY_COLUMNS:
+        if all(col in frame.columns and isinstance(frame[col].dtype, pd.CategoricalDtype) for frame in frames):
+            categories = union_categoricals([frame[col] for frame in frames], ignore_order=True).categories
+            frames = [frame.assign(**{col: frame[col].cat.set_categories(categories)}) for frame in frames]
+    return pd.concat(frames, ignore_index=True)
+
+
+def update_market_caps(merged_data, market_caps):
+    """Reemplaza Market Cap y recalcula Change as % of Market Cap solo en las filas de esos tickers."""
+    rows = merged_data["Ticker"].astype(str).map(market_caps)
+    mask = rows.notna().to_numpy()
+    updated = merged_data.copy(deep=False)
+    new_caps = rows[mask].to_numpy(dtype=np.float64)
+    change = updated.loc[mask, "Change in Value"].to_numpy(dtype=np.float64)
+    updated.loc[mask, "Market Cap"] = new_caps
+    updated.loc[mask, "Change as % of Market Cap"] = np.where(
+        new_caps > 0, change * 1e6 / np.where(new_caps > 0, new_caps, 1) * 100, 0
+    ).astype(updated["Change as % of Market Cap"].dtype)
+    return updated, int(mask.sum())
+
+
+def apply_refresh(merged_data, plan, institutional_holders, general_data, live_market_caps):
+    """Aplica un plan 'incremental' y devuelve `(merged_data, resumen)`."""
+    summary = {"market_cap_tickers": len(plan["market_caps"]), "market_cap_rows": 0, "new_rows": 0}
+    if len(plan["market_caps"]):
+        merged_data, summary["market_cap_rows"] = update_market_caps(merged_data, plan["market_caps"])
+    if plan["new_rows"].any():
+        # 🔹 Solo las filas nuevas pasan por el merge y las columnas derivadas
+        new_holders = institutional_holders[plan["new_rows"]]
+        new_data = build_merged_data(new_holders, general_data, live_market_caps)
+        merged_data = _concat_with_categories([merged_data, new_data[merged_data.columns]])
+        summary["new_rows"] = len(new_data)
+    return merged_data, summary
@@ -0,0 +1,216 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from utils.quote_providers import get_provider
+
+logger = logging.getLogger(__name__)
+
+# Símbolos del universo que Yahoo escribe distinto (clases de acciones con guion)
+SYMBOL_MAP = {
+    "BRK.B": "BRK-B",
+    "BRK.A": "BRK-A",
+    "BF.B": "BF-B",
+    "BF.A": "BF-A",
+}
+
+
+def load_symbol_map(path=None):
+    """SYMBOL_MAP más las filas de un CSV opcional con columnas Ticker,Symbol (el CSV tiene prioridad)."""
+    symbol_map = dict(SYMBOL_MAP)
+    if path:
+        overrides = pd.read_csv(path, dtype=str).dropna(subset=["Ticker", "Symbol"])
+        symbol_map.update(zip(overrides["Ticker"].str.strip(), overrides["Symbol"].str.strip()))
+    return symbol_map
+
+
+class RateLimiter:
+    """
+    Token bucket thread-safe: permite `rate` requests por segundo con ráfagas
+    de hasta `burst` requests.
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else max(1.0, rate))
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def set_rate(self, rate, burst=None):
+        """Cambia la tasa (y la ráfaga) sin perder los tokens acumulados hasta ahora."""
+        with self._lock:
+            now = time.monotonic()
+            if self.rate > 0:
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self.rate = float(rate)
+            self.burst = float(burst if burst is not None else max(1.0, rate))
+            self._tokens = min(self._tokens, self.burst)
+
+    def acquire(self):
+        """Bloquea hasta que haya un token disponible."""
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+_HOST_LIMITERS = {}
+_HOST_LIMITERS_LOCK = threading.Lock()
+
+
+def _stricter(rate, other):
+    """True si `rate` limita más que `other` (0 o menos es sin límite)."""
+    return rate > 0 and (other <= 0 or rate < other)
+
+
+def get_host_limiter(host, rate):
+    """
+    Devuelve el limitador compartido del host (uno por proceso). Si otro fetcher pide
+    una tasa distinta queda la más estricta, así ninguno supera lo que pidió; el cambio
+    (o la tasa ignorada) se registra como advertencia.
+    """
+    rate = float(rate)
+    with _HOST_LIMITERS_LOCK:
+        limiter = _HOST_LIMITERS.get(host)
+        if limiter is None:
+            limiter = _HOST_LIMITERS[host] = RateLimiter(rate)
+        elif limiter.rate != rate:
+            if _stricter(rate, limiter.rate):
+                logger.warning("%s: la tasa compartida baja de %s a %s req/s", host, limiter.rate, rate)
+                limiter.set_rate(rate)
+            else:
+                logger.warning("%s: se ignora la tasa de %s req/s, sigue la compartida de %s req/s",
+                               host, rate, limiter.rate)
+        return limiter
+
+
+class MarketDataFetcher:
+    """
+    Descarga `info` de muchos tickers en paralelo.
+
+    - `max_workers`: tickers consultados en simultáneo.
+    - `requests_per_second`: límite compartido por todos los fetchers del mismo host.
+    - `retries` / `backoff`: reintentos con espera exponencial (backoff * 2**intento).
+    - `timeout`: segundos máximos por intento; un intento colgado no bloquea al resto.
+
+    `provider` es un `QuoteProvider` (por defecto el de `get_provider()`, yfinance
+    salvo que QUOTE_PROVIDER diga otra cosa). Si el proveedor tiene `supports_bulk`,
+    los tickers se piden en grupos de `bulk_size` con `get_infos`.
+    `symbol_map` traduce tickers del universo al símbolo del proveedor; los
+    resultados siempre quedan indexados por el ticker original.
+    """
+
+    def __init__(self, provider=None, max_workers=8, requests_per_second=5.0,
+                 retries=2, backoff=0.5, timeout=10.0, symbol_map=None, bulk_size=50):
+        self.provider = provider or get_provider()
+        self.symbol_map = SYMBOL_MAP if symbol_map is None else symbol_map
+        self.max_workers = max(1, int(max_workers))
+        self.retries = max(0, int(retries))
+        self.backoff = backoff
+        self.timeout = timeout
+        self.bulk_size = max(1, int(bulk_size))
+        if getattr(self.provider, "rate_limited", True):
+            host = getattr(self.provider, "host", None) or type(self.provider).__name__
+            self.limiter = get_host_limiter(host, requests_per_second)
+        else:
+            self.limiter = RateLimiter(0)
+        self.errors = {}
+
+    def _call_with_timeout(self, call, label):
+        result = {}
+        done = threading.Event()
+
+        def target():
+            try:
+                result["value"] = call()
+            except Exception as e:
+                result["error"] = e
+            finally:
+                done.set()
+
+        # Hilo daemon por intento: si el proveedor se cuelga, se abandona sin ocupar el pool
+        threading.Thread(target=target, daemon=True).start()
+        if not done.wait(self.timeout):
+            raise TimeoutError(f"{label}: sin respuesta en {self.timeout}s")
+        if "error" in result:
+            raise result["error"]
+        return result["value"]
+
+    def _with_retries(self, call, label):
+        """Ejecuta `call` con rate limit, timeout y reintentos; devuelve (resultado, error)."""
+        last_error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.backoff * (2 ** (attempt - 1)) * (1 + random.random() * 0.1))
+            self.limiter.acquire()
+            try:
+                return self._call_with_timeout(call, label), None
+            except Exception as e:
+                last_error = e
+        return None, last_error
+
+    def _fetch_one(self, ticker):
+        symbol = self.symbol_map.get(ticker, ticker)
+        info, error = self._with_retries(lambda: self.provider.get_info(symbol), ticker)
+        return [(ticker, info, error)]
+
+    def _fetch_chunk(self, tickers):
+        symbols = {self.symbol_map.get(t, t): t for t in tickers}
+        infos, error = self._with_retries(lambda: self.provider.get_infos(list(symbols)), f"{len(tickers)} tickers")
+        infos = infos or {}
+        missing = error or KeyError("sin respuesta del proveedor")
+        return [(ticker, infos.get(symbol), None if symbol in infos else missing)
+                for symbol, ticker in symbols.items()]
+
+    def fetch_info_with_errors(self, tickers):
+        """
+        Devuelve `(infos, errors)`: {ticker: info} de los que respondieron y {ticker: excepción}
+        de los que fallaron. No guarda estado, así que un mismo fetcher se puede usar desde varios hilos.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        errors = {}
+        infos = {}
+        if not tickers:
+            return infos, errors
+        # 🔹 Un pedido por ticker, o por grupo si el proveedor admite pedidos en bloque
+        if getattr(self.provider, "supports_bulk", False):
+            tasks = [tickers[i:i + self.bulk_size] for i in range(0, len(tickers), self.bulk_size)]
+            fetch = self._fetch_chunk
+        else:
+            tasks, fetch = tickers, self._fetch_one
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as pool:
+            for results in pool.map(fetch, tasks):
+                for ticker, info, error in results:
+                    if error is not None:
+                        errors[ticker] = error
+                    elif info:
+                        infos[ticker] = info
+        return infos, errors
+
+    def fetch_info(self, tickers):
+        """Devuelve {ticker: info} para los tickers que respondieron; los fallos quedan en `self.errors`."""
+        infos, self.errors = self.fetch_info_with_errors(tickers)
+        return infos
+
+    def fetch_field(self, tickers, field):
+        """Devuelve {ticker: valor} de un campo de `info`, omitiendo valores vacíos."""
+        values = {}
+        for ticker, info in self.fetch_info(tickers).items():
+            value = info.get(field, None)
+            if value:
+                values[ticker] = value
+        return values
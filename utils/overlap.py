@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+# Máximo de items comparables: un bit por item en la máscara de pertenencia
+MAX_OVERLAP_ITEMS = 20
+
+
+def membership_masks(index, item_list, comparison_field):
+    """
+    Devuelve `(entity_ids, masks)`: las entidades que aparecen en al menos un item
+    y, para cada una, una máscara de bits con el bit `i` encendido si pertenece a `item_list[i]`.
+    """
+    if len(item_list) > MAX_OVERLAP_ITEMS:
+        raise ValueError(f"Se admiten hasta {MAX_OVERLAP_ITEMS} elementos.")
+    ids = [index.entity_ids(item, comparison_field) for item in item_list]
+    if not ids:
+        return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.uint32)
+    entity_ids = np.unique(np.concatenate(ids))
+    masks = np.zeros(len(entity_ids), dtype=np.uint32)
+    for bit, item_ids in enumerate(ids):
+        masks[np.searchsorted(entity_ids, item_ids)] |= np.uint32(1 << bit)
+    return entity_ids, masks
+
+
+def _mask_bits(masks, n_items):
+    """Matriz booleana (len(masks) × n_items) con los bits de cada máscara."""
+    return ((masks[:, None] >> np.arange(n_items, dtype=np.uint32)) & 1).astype(bool)
+
+
+def overlap_regions(index, item_list, comparison_field):
+    """
+    Regiones de intersección no vacías (estilo UpSet): cada región es la combinación
+    exacta de items a la que pertenecen sus entidades. Columnas: 'Máscara', 'Combinación',
+    'Grado' (cantidad de items) y 'Cantidad', ordenadas por cantidad descendente.
+    """
+    _, masks = membership_masks(index, item_list, comparison_field)
+    region_masks, counts = np.unique(masks, return_counts=True)
+    bits = _mask_bits(region_masks, len(item_list))
+    names = np.asarray(item_list, dtype=object)
+    regions = pd.DataFrame({
+        "Máscara": region_masks,
+        "Combinación": [" ∩ ".join(names[row]) for row in bits],
+        "Grado": bits.sum(axis=1),
+        "Cantidad": counts,
+    })
+    return regions.sort_values(["Cantidad", "Grado"], ascending=[False, False], kind="mergesort", ignore_index=True)
+
+
+def region_members(index, item_list, comparison_field, mask):
+    """Nombres de las entidades que pertenecen exactamente a la combinación `mask`."""
+    entity_ids, masks = membership_masks(index, item_list, comparison_field)
+    return sorted(index.entity_names(entity_ids[masks == mask], comparison_field))
+
+
+def jaccard_matrix(index, item_list, comparison_field):
+    """Índice de Jaccard |A ∩ B| / |A ∪ B| para cada par de items, como DataFrame cuadrado."""
+    _, masks = membership_masks(index, item_list, comparison_field)
+    bits = _mask_bits(masks, len(item_list)).astype(np.float64)
+    intersections = bits.T @ bits
+    sizes = np.diag(intersections)
+    unions = sizes[:, None] + sizes[None, :] - intersections
+    with np.errstate(divide="ignore", invalid="ignore"):
+        jaccard = np.where(unions > 0, intersections / unions, 0.0)
+    return pd.DataFrame(jaccard, index=item_list, columns=item_list)
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+
+
+class OwnershipIndex:
+    """
+    Índice invertido ticker ↔ tenedor en formato CSR: para cada ticker, los ids
+    (int32, ordenados) de sus tenedores y, para cada tenedor, los ids de sus tickers.
+    Se construye una vez por frame y responde conjuntos, intersecciones y conteos
+    sin volver a recorrer la tabla.
+    """
+
+    def __init__(self, df):
+        ticker_codes, tickers = pd.factorize(df["Ticker"], sort=True)
+        holder_codes, holders = pd.factorize(df["Owner Name"], sort=True)
+        self.tickers = np.asarray(tickers, dtype=object)
+        self.holders = np.asarray(holders, dtype=object)
+        n_tickers, n_holders = len(self.tickers), len(self.holders)
+
+        # 🔹 Pares únicos (ticker, tenedor), ordenados por ticker y luego por tenedor
+        pairs = np.unique(ticker_codes.astype(np.int64) * max(n_holders, 1) + holder_codes)
+        pair_tickers = (pairs // max(n_holders, 1)).astype(np.int32)
+        pair_holders = (pairs % max(n_holders, 1)).astype(np.int32)
+
+        self.ticker_indptr = np.concatenate(([0], np.cumsum(np.bincount(pair_tickers, minlength=n_tickers))))
+        self.ticker_holders = pair_holders
+
+        order = np.lexsort((pair_tickers, pair_holders))
+        self.holder_indptr = np.concatenate(([0], np.cumsum(np.bincount(pair_holders, minlength=n_holders))))
+        self.holder_tickers = pair_tickers[order]
+
+        self._ticker_ids = {name: i for i, name in enumerate(self.tickers)}
+        self._holder_ids = {name: i for i, name in enumerate(self.holders)}
+
+    # === Consultas por id ===
+    def holder_ids_of(self, ticker):
+        """Ids ordenados de los tenedores de `ticker` (vacío si no existe)."""
+        i = self._ticker_ids.get(ticker)
+        if i is None:
+            return np.empty(0, dtype=np.int32)
+        return self.ticker_holders[self.ticker_indptr[i]:self.ticker_indptr[i + 1]]
+
+    def ticker_ids_of(self, holder):
+        """Ids ordenados de los tickers de `holder` (vacío si no existe)."""
+        i = self._holder_ids.get(holder)
+        if i is None:
+            return np.empty(0, dtype=np.int32)
+        return self.holder_tickers[self.holder_indptr[i]:self.holder_indptr[i + 1]]
+
+    def entity_ids(self, item, comparison_field):
+        """Ids de las entidades del otro lado: tenedores si se compara por Ticker, tickers si por tenedor."""
+        return self.holder_ids_of(item) if comparison_field == "Ticker" else self.ticker_ids_of(item)
+
+    def entity_names(self, ids, comparison_field):
+        """Traduce ids devueltos por `entity_ids` a nombres."""
+        return (self.holders if comparison_field == "Ticker" else self.tickers)[ids]
+
+    # === Conjuntos y conteos ===
+    def entity_sets(self, item_list, comparison_field):
+        """Un set de nombres por item, equivalente a filtrar la tabla y tomar `unique()`."""
+        return [set(self.entity_names(self.entity_ids(item, comparison_field), comparison_field))
+                for item in item_list]
+
+    def common_ids(self, item_list, comparison_field):
+        """Ids presentes en todos los items (intersección de arrays ordenados)."""
+        ids = [self.entity_ids(item, comparison_field) for item in item_list]
+        if not ids:
+            return np.empty(0, dtype=np.int32)
+        common = ids[0]
+        for other in ids[1:]:
+            common = np.intersect1d(common, other, assume_unique=True)
+        return common
+
+    def tickers_per_holder(self):
+        """Cantidad de tickers distintos por tenedor."""
+        return pd.Series(np.diff(self.holder_indptr), index=pd.Index(self.holders, name="Owner Name"))
+
+    def holders_per_ticker(self):
+        """Cantidad de tenedores distintos por ticker."""
+        return pd.Series(np.diff(self.ticker_indptr), index=pd.Index(self.tickers, name="Ticker"))
+
+    def commonality(self, group_by):
+        """
+        % de las entidades del otro lado cubiertas por cada grupo: para 'Owner Name',
+        % de todos los tickers en cartera; para 'Ticker', % de todos los tenedores.
+        """
+        if group_by == "Owner Name":
+            counts, total = self.tickers_per_holder(), len(self.tickers)
+        else:
+            counts, total = self.holders_per_ticker(), len(self.holders)
+        return (counts / max(total, 1) * 100).reset_index(name="Percentage")
@@ -2,16 +2,24 @@ import pandas as pd
 import streamlit as st
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.subplots import make_subplots
 import numpy as np
 import math
 import matplotlib.pyplot as plt
 from matplotlib_venn import venn2, venn3
 
+from utils.ranking import top_k
+
 # === Gráfico top 20 barras ===
 def plot_top_20(df, x, y, title, color):
-    df = df.sort_values(by=y, ascending=False)
-    top_20 = df.head(20)
-    others = df.iloc[20:][y].mean() if len(df) > 20 else None
+    top_20 = top_k(df, y, 20)
+    others = None
+    if len(df) > 20:
+        # Promedio del resto sin ordenar: partition separa los 20 mayores (NaN fuera, ±inf como en el orden)
+        values = df[y].to_numpy(dtype=np.float64, na_value=np.nan)
+        values = values[~np.isnan(values)]
+        rest_count = len(values) - len(top_20)
+        others = np.partition(values, rest_count)[:rest_count].mean() if rest_count > 0 else np.nan
 
     if others is not None:
         others_row = pd.DataFrame({x: ['Otros - Promedio'], y: [others]})
@@ -23,30 +31,27 @@ def plot_top_20(df, x, y, title, color):
 
 # === Gráfico de cambios ===
 def plot_changes(df, x, y_num, title, is_percentage=False):
-    plot_df = df[~np.isinf(df[y_num])].copy()
-    plot_df = plot_df.sort_values(by=y_num, ascending=False)
-    top_20 = plot_df.head(20)
+    plot_df = df[~np.isinf(df[y_num])]
+    top_20 = top_k(plot_df, y_num, 20)
     colors = ['green' if val > 0 else 'red' if val < 0 else 'grey' for val in top_20[y_num]]
     fig = go.Figure(data=[go.Bar(x=top_20[x], y=top_20[y_num], marker_color=colors)])
     fig.update_layout(title=title, xaxis_title=x, yaxis_title='Shares Change %' if is_percentage else 'Shares Change')
     st.plotly_chart(fig, use_container_width=True)
 
 # === Diagrama tipo Venn con Plotly ===
-def plot_venn_like_comparison(item_list, comparison_field, data):
+def plot_venn_like_comparison(item_list, comparison_field, index):
     num_items = len(item_list)
     if not (2 <= num_items <= 3):
         st.warning("Seleccione 2 o 3 elementos para el diagrama de Venn.")
         return
 
     if comparison_field == 'Ticker':
-        entity_field = 'Owner Name'
         title_entities = "Tenedores"
     else:
-        entity_field = 'Ticker'
         title_entities = "Tickers"
 
     title = f"Coincidencia de {title_entities} entre {', '.join(item_list)}"
-    sets = [set(data[data[comparison_field] == item][entity_field].unique()) for item in item_list]
+    sets = index.entity_sets(item_list, comparison_field)
     fig = go.Figure()
     opacity = 0.6
     colors = ["#636EFA", "#EF553B", "#00CC96"]
@@ -141,21 +146,19 @@ def plot_venn_like_comparison(item_list, comparison_field, data):
     st.plotly_chart(fig, use_container_width=True)
 
 # === Diagramas de Venn con matplotlib ===
-def plot_matplotlib_venn(item_list, comparison_field, data):
+def plot_matplotlib_venn(item_list, comparison_field, index):
     num_items = len(item_list)
     if not (2 <= num_items <= 3):
         st.warning("La comparación con diagramas de Venn solo admite 2 o 3 elementos.")
         return
 
     if comparison_field == 'Ticker':
-        entity_field = 'Owner Name'
         title_entities = "Tenedores Institucionales"
     else:
-        entity_field = 'Ticker'
         title_entities = "Tickers"
 
     title = f"Coincidencia Proporcional de {title_entities} entre {', '.join(item_list)}"
-    sets = [set(data[data[comparison_field] == item][entity_field].unique()) for item in item_list]
+    sets = index.entity_sets(item_list, comparison_field)
     set_labels = item_list
 
     fig, ax = plt.subplots(figsize=(10,7))
@@ -170,6 +173,37 @@ def plot_matplotlib_venn(item_list, comparison_field, data):
             fontsize=30,color="gray",alpha=0.3,ha="center",va="center",rotation=30,zorder=10)
     st.pyplot(fig)
 
+# === Coincidencias N-way (estilo UpSet) ===
+def plot_upset(regions, item_list, title_entities, max_regions=40):
+    """
+    Barras con el tamaño de cada región de `overlap_regions` y, debajo, la matriz
+    de puntos que indica qué items forman cada combinación.
+    """
+    regions = regions.head(max_regions)
+    labels = [f"R{i + 1}" for i in range(len(regions))]
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.6, 0.4], vertical_spacing=0.03)
+    fig.add_trace(go.Bar(x=labels, y=regions["Cantidad"], customdata=regions["Combinación"],
+                         hovertemplate="%{customdata}<br>%{y}<extra></extra>", marker_color="#636EFA"),
+                  row=1, col=1)
+
+    # 🔹 Matriz de puntos: gris para los items ausentes, oscuro para los presentes
+    masks = regions["Máscara"].to_numpy()
+    for i, item in enumerate(item_list):
+        present = (masks >> i) & 1 == 1
+        fig.add_trace(go.Scatter(x=labels, y=[item] * len(labels), mode="markers",
+                                 marker=dict(size=10, color=np.where(present, "#222222", "#DDDDDD")),
+                                 hoverinfo="skip"), row=2, col=1)
+
+    fig.update_layout(title=f"Coincidencias de {title_entities} entre {len(item_list)} elementos",
+                      showlegend=False, height=400 + 25 * len(item_list))
+    fig.update_yaxes(title_text=f"Cantidad de {title_entities}", row=1, col=1)
+    fig.update_yaxes(categoryorder="array", categoryarray=list(item_list)[::-1], row=2, col=1)
+    st.plotly_chart(fig, use_container_width=True)
+
+def plot_jaccard_heatmap(jaccard, title):
+    fig = px.imshow(jaccard, text_auto=".2f", zmin=0, zmax=1, color_continuous_scale="Blues", title=title)
+    st.plotly_chart(fig, use_container_width=True)
+
 # === Sectores/industrias ===
 def plot_sector_industry(df, group_field, value_field="Valor Total (USD millones)", color="blue"):
     plot_top_20(df.reset_index(), x=group_field, y=value_field, title=f"Top {group_field}", color=color)
@@ -189,7 +223,7 @@ def plot_holder_composition(merged_data, holder_name, group_field="Sector"):
     if holder_data.empty:
         st.warning(f"No hay datos para el tenedor {holder_name}")
         return
-    holder_group = holder_data.groupby(group_field)["Individual Holdings Value"].sum().reset_index().sort_values("Individual Holdings Value", ascending=False)
+    holder_group = holder_data.groupby(group_field, observed=True)["Individual Holdings Value"].sum().reset_index().sort_values("Individual Holdings Value", ascending=False)
     fig = px.pie(holder_group, names=group_field, values="Individual Holdings Value", title=f"Composición de cartera de {holder_name} por {group_field}", hole=0.3)
     st.plotly_chart(fig, use_container_width=True)
 
@@ -207,7 +241,8 @@ def plot_holder_distribution(merged_data, group_field):
         columns=group_field,
         values='Individual Holdings Value',
         aggfunc='sum',
-        fill_value=0
+        fill_value=0,
+        observed=True
     )
     if pivot.empty:
         st.warning("No hay datos después de pivotar para la distribución de tenedores.")
@@ -240,7 +275,8 @@ def plot_holders_heatmap(merged_data, group_field):
         columns=group_field,
         values='Individual Holdings Value',
         aggfunc='sum',
-        fill_value=0
+        fill_value=0,
+        observed=True
     )
     if pivot.empty:
         st.warning("No hay datos después de pivotar para el heatmap de tenedores.")
@@ -266,7 +302,7 @@ def plot_market_concentration(merged_data, group_field, top_n=5, top_bottom="Top
     import plotly.express as px
     import streamlit as st
 
-    df = merged_data.copy()
+    df = merged_data
 
     # Validar columna
     if group_field not in df.columns:
@@ -277,19 +313,25 @@ def plot_market_concentration(merged_data, group_field, top_n=5, top_bottom="Top
         st.warning("No hay datos para mostrar.")
         return
 
-    # Calcular % del grupo
-    df["Pct of Group"] = df.groupby(group_field)["Individual Holdings Value"].transform(
-        lambda x: x / x.sum() * 100
+    # Valor por grupo + tenedor y % del grupo (suma del tenedor / total del grupo)
+    top_holders = (
+        df.groupby([group_field, "Owner Name"], observed=True)["Individual Holdings Value"]
+        .sum()
+        .rename("Pct of Group")
+        .reset_index()
+    )
+    group_totals = top_holders.groupby(group_field, observed=True)["Pct of Group"].transform("sum")
+    # Grupos sin valor (total 0 o NaN) quedan en 0%, igual que sumar porcentajes NaN
+    top_holders["Pct of Group"] = (top_holders["Pct of Group"] / group_totals * 100).fillna(0)
+
+    # Seleccionar top/bottom N por grupo con un ranking dentro de cada grupo
+    ascending = top_bottom == "Bottom N"
+    rank = top_holders.groupby(group_field, observed=True)["Pct of Group"].rank(method="first", ascending=ascending)
+    result = (
+        top_holders[rank <= top_n]
+        .sort_values([group_field, "Pct of Group"], ascending=[True, ascending], kind="mergesort")
+        .reset_index(drop=True)
     )
-
-    # Agrupar por grupo + tenedor
-    top_holders = df.groupby([group_field, "Owner Name"])["Pct of Group"].sum().reset_index()
-
-    # Seleccionar top/bottom N por grupo
-    result = pd.DataFrame()
-    for grp, group_df in top_holders.groupby(group_field):
-        group_df = group_df.sort_values("Pct of Group", ascending=(top_bottom=="Bottom N"))
-        result = pd.concat([result, group_df.head(top_n)], ignore_index=True)
 
     if result.empty:
         st.warning("No hay tenedores para mostrar en esta selección.")
@@ -327,7 +369,8 @@ def plot_multiple_holders_comparison(merged_data, selected_holders, group_field)
         columns=group_field,
         values="Individual Holdings Value",
         aggfunc='sum',
-        fill_value=0
+        fill_value=0,
+        observed=True
     )
     pivot_pct = pivot.div(pivot.sum(axis=1), axis=0) * 100
     fig = px.bar(
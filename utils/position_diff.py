@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from utils.data_processing import compact_dtypes, derive_position_columns
+from utils.flows import FLOW_CATEGORIES, classify_flows
+
+POSITION_COLUMNS = ["Ticker", "Owner Name", "Date", "Shares Held", "Shares Change"]
+DERIVED_COLUMNS = ["Percentage Owned", "Individual Holdings Value", "Change in Value",
+                   "Change as % of Market Cap", "Previous Shares", "Shares Change %"]
+# Categoría de las posiciones sin cambios (FLOW_OTHER en classify_flows)
+FLOW_LABELS = FLOW_CATEGORIES + ["unchanged"]
+
+
+def _aggregate_positions(keys, shares):
+    """Suma las acciones por clave (varias filas con el mismo tenedor y ticker); claves ordenadas."""
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    return sorted_keys[starts], np.add.reduceat(shares[order], starts) if len(starts) else shares[:0]
+
+
+def _lookup(keys, table_keys, table_values):
+    """Valor de cada clave en (table_keys, table_values) ordenados; 0 si no está."""
+    pos = np.searchsorted(table_keys, keys)
+    pos = np.minimum(pos, max(len(table_keys) - 1, 0))
+    found = (table_keys[pos] == keys) if len(table_keys) else np.zeros(len(keys), dtype=bool)
+    return np.where(found, table_values[pos] if len(table_keys) else 0, 0)
+
+
+def diff_positions(old, new, date=None):
+    """
+    Cambios de posición calculados entre dos fotos (`old` → `new`) para todo el universo.
+    Une por (Owner Name, Ticker) con claves enteras ordenadas: las posiciones que solo
+    están en `new` son nuevas y las que solo están en `old` quedan cerradas (Shares Held = 0).
+    Devuelve las mismas columnas que `build_merged_data` más 'Flow' (ver FLOW_LABELS).
+    """
+    # 🔹 Códigos enteros compartidos por ambas fotos
+    owner_codes, owners = pd.factorize(pd.concat([old["Owner Name"], new["Owner Name"]], ignore_index=True))
+    ticker_codes, tickers = pd.factorize(pd.concat([old["Ticker"], new["Ticker"]], ignore_index=True))
+    keys = owner_codes.astype(np.int64) * max(len(tickers), 1) + ticker_codes
+    shares = np.concatenate([
+        old["Shares Held"].to_numpy(dtype=np.float64, na_value=0),
+        new["Shares Held"].to_numpy(dtype=np.float64, na_value=0),
+    ])
+    old_keys, old_shares = _aggregate_positions(keys[:len(old)], shares[:len(old)])
+    new_keys, new_shares = _aggregate_positions(keys[len(old):], shares[len(old):])
+
+    union = np.union1d(old_keys, new_keys)
+    previous = _lookup(union, old_keys, old_shares)
+    held = _lookup(union, new_keys, new_shares)
+
+    diff = pd.DataFrame({
+        "Ticker": np.asarray(tickers)[union % max(len(tickers), 1)],
+        "Owner Name": np.asarray(owners)[union // max(len(tickers), 1)],
+        "Date": pd.Timestamp(date) if date is not None else new["Date"].max(),
+        "Shares Held": held,
+        "Shares Change": held - previous,
+    })
+
+    # 🔹 Datos del ticker (no dependen de la fecha): una fila por ticker de cualquiera de las dos fotos
+    ticker_columns = ["Ticker"] + [c for c in new.columns if c not in POSITION_COLUMNS + DERIVED_COLUMNS]
+    ticker_data = (pd.concat([new[ticker_columns], old[ticker_columns]], ignore_index=True)
+                     .drop_duplicates("Ticker"))
+    ticker_data["Ticker"] = ticker_data["Ticker"].astype(object)
+    diff = diff.merge(ticker_data, on="Ticker", how="left")
+
+    derive_position_columns(diff)
+    diff["Flow"] = pd.Categorical.from_codes(classify_flows(diff), FLOW_LABELS)
+    return compact_dtypes(diff)
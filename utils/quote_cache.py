@@ -0,0 +1,145 @@
+import os
+import threading
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+
+class TickerCache:
+    """
+    Cache en disco por ticker: Ticker → uno o más campos, fetched_at, source.
+
+    `value_columns` es el nombre de un campo numérico o un dict campo → dtype
+    ("float64" para números, "object" para texto). `ttl` puede ser un único
+    timedelta o un dict campo → timedelta: cada campo vence por separado.
+    Los campos consultados sin resultado se guardan como NaN y se reintentan tras
+    `miss_ttl`, así un reinicio solo vuelve a pedir los tickers vencidos o faltantes.
+    Cada campo guarda su propia fecha (`<campo> fetched_at`): `update` escribe campo por
+    campo y lo que no se consultó conserva valor y vigencia; `fetched_at` es la última escritura.
+    Las escrituras son atómicas (archivo temporal + `os.replace`).
+    """
+
+    def __init__(self, path, value_columns, ttl=timedelta(days=1), miss_ttl=timedelta(hours=1)):
+        self.path = path
+        if isinstance(value_columns, str):
+            value_columns = {value_columns: "float64"}
+        self.dtypes = dict(value_columns)
+        self.value_columns = list(self.dtypes)
+        self.value_column = self.value_columns[0]
+        self.ttls = ttl if isinstance(ttl, dict) else {col: ttl for col in self.value_columns}
+        self.miss_ttl = miss_ttl
+        self._lock = threading.Lock()
+        # Última lectura del archivo, reutilizada mientras no cambie su mtime
+        self._loaded = (None, None)
+
+    @staticmethod
+    def stamp_column(column):
+        """Columna con la fecha en que se obtuvo `column`."""
+        return f"{column} fetched_at"
+
+    def _empty(self):
+        return pd.DataFrame({
+            "Ticker": pd.Series(dtype="object"),
+            **{col: pd.Series(dtype=dtype) for col, dtype in self.dtypes.items()},
+            **{self.stamp_column(col): pd.Series(dtype="datetime64[ns, UTC]") for col in self.value_columns},
+            "fetched_at": pd.Series(dtype="datetime64[ns, UTC]"),
+            "source": pd.Series(dtype="object"),
+        })
+
+    def load(self):
+        """
+        Lee el cache completo (sin releer el archivo si no cambió); si no existe, está
+        corrupto o tiene el formato viejo devuelve uno vacío. El frame es compartido: no modificar.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            return self._empty()
+        loaded_mtime, loaded = self._loaded
+        if loaded_mtime == mtime:
+            return loaded
+        try:
+            df = pd.read_parquet(self.path)
+        except Exception:
+            return self._empty()
+        if "fetched_at" not in df.columns or not set(self.value_columns) <= set(df.columns):
+            return self._empty()
+        df["fetched_at"] = pd.to_datetime(df["fetched_at"], utc=True)
+        for col in self.value_columns:
+            # Formato anterior: una sola fecha por fila
+            stamp = self.stamp_column(col)
+            df[stamp] = pd.to_datetime(df[stamp], utc=True) if stamp in df.columns else df["fetched_at"]
+        self._loaded = (mtime, df)
+        return df
+
+    def _is_fresh(self, df, now, column=None):
+        column = column or self.value_column
+        age = now - df[self.stamp_column(column)]
+        ttl = np.where(df[column].notna(), self.ttls[column], self.miss_ttl)
+        return age < pd.to_timedelta(ttl)
+
+    def entries(self, tickers, column=None, now=None):
+        """
+        Valor de `column` para cada ticker pedido con su fetched_at y si está vencido,
+        sin filtrar por vigencia. Los tickers que no están en el cache vienen vacíos y vencidos.
+        """
+        column = column or self.value_column
+        now = now or pd.Timestamp.now(tz="UTC")
+        df = self.load()
+        df = df.assign(stale=~self._is_fresh(df, now, column)).set_index("Ticker")
+        df = df[~df.index.duplicated(keep="last")].reindex(list(tickers))
+        df["stale"] = df["stale"].fillna(True).astype(bool)
+        df["fetched_at"] = df[self.stamp_column(column)]
+        return df[[column, "fetched_at", "stale"]]
+
+    def fresh_values(self, tickers, now=None, column=None):
+        """Devuelve {ticker: valor} de `column` (por defecto el primer campo) en las entradas vigentes con valor."""
+        column = column or self.value_column
+        now = now or pd.Timestamp.now(tz="UTC")
+        df = self.load()
+        df = df[df["Ticker"].isin(list(tickers))]
+        df = df[self._is_fresh(df, now, column) & df[column].notna()]
+        return dict(zip(df["Ticker"], df[column]))
+
+    def stale_tickers(self, tickers, now=None, columns=None):
+        """Tickers pedidos que faltan en el cache o con alguno de `columns` vencido."""
+        now = now or pd.Timestamp.now(tz="UTC")
+        df = self.load()
+        fresh = np.ones(len(df), dtype=bool)
+        for column in columns or [self.value_column]:
+            fresh &= np.asarray(self._is_fresh(df, now, column))
+        fresh = set(df.loc[fresh, "Ticker"])
+        return [t for t in dict.fromkeys(tickers) if t not in fresh]
+
+    def update(self, values, misses=(), source="yfinance", now=None):
+        """
+        Guarda las entradas dadas campo por campo, de forma atómica. `values` es {ticker: valor}
+        para el primer campo o {ticker: {campo: valor}}: se escriben solo los campos presentes
+        (None = consultado sin resultado) y el resto conserva su valor y su fecha. `misses` son
+        tickers que respondieron sin datos: todos sus campos quedan vacíos.
+        """
+        now = now or pd.Timestamp.now(tz="UTC")
+        updates = {t: row if isinstance(row, dict) else {self.value_column: row} for t, row in values.items()}
+        updates.update({t: dict.fromkeys(self.value_columns) for t in misses if t not in updates})
+        if not updates:
+            return
+        tickers = list(updates)
+        with self._lock:
+            old = self.load()
+            old = old[~old["Ticker"].duplicated(keep="last")]
+            # 🔹 Se parte de la entrada anterior de cada ticker (vacía si no estaba)
+            new = old.set_index("Ticker").reindex(pd.Index(tickers, name="Ticker"))
+            for col, dtype in self.dtypes.items():
+                written = [t for t in tickers if col in updates[t]]
+                if written:
+                    new.loc[written, col] = pd.Series([updates[t][col] for t in written], index=written, dtype=dtype)
+                    new.loc[written, self.stamp_column(col)] = now
+            new["fetched_at"] = now
+            new["source"] = source
+            rest = old[~old["Ticker"].isin(tickers)]
+            new = new.reset_index()
+            df = pd.concat([rest, new], ignore_index=True) if not rest.empty else new
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, self.path)
@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+from abc import ABC, abstractmethod
+
+import yfinance as yf
+
+# Proveedor por defecto; QUOTE_PROVIDER=replay:<archivo.json> o record:<archivo.json> lo cambia
+QUOTE_PROVIDER_ENV = "QUOTE_PROVIDER"
+DEFAULT_PROVIDER = "yfinance"
+
+
+class QuoteProvider(ABC):
+    """
+    Interfaz de los proveedores de datos por ticker que usa `MarketDataFetcher`.
+
+    - `get_info(symbol) -> dict` con las claves de Yahoo (marketCap, regularMarketPrice,
+      sector, industry, ...); lanza una excepción si el símbolo no responde.
+    - `get_infos(symbols) -> {symbol: dict}` pide varios símbolos juntos; los que no
+      responden se omiten. La versión base llama a `get_info` uno por uno.
+    - `supports_bulk`: si es True el fetcher agrupa los tickers y usa `get_infos`.
+    - `host`: clave del rate limiter compartido; `rate_limited = False` lo desactiva.
+    - `name`: se guarda como `source` en el cache de datos de referencia.
+    - `offline`: respuestas que no son datos reales (replay); no se mezclan con el cache compartido.
+    """
+
+    name = None
+    host = None
+    supports_bulk = False
+    rate_limited = True
+    offline = False
+
+    @abstractmethod
+    def get_info(self, symbol):
+        """Info de un símbolo; lanza una excepción si no responde."""
+
+    def get_infos(self, symbols):
+        infos = {}
+        for symbol in symbols:
+            try:
+                infos[symbol] = self.get_info(symbol)
+            except Exception:
+                continue
+        return infos
+
+
+class YFinanceProvider(QuoteProvider):
+    """Proveedor de cotizaciones por defecto: `yf.Ticker(t).info`."""
+
+    name = "yfinance"
+    host = "query2.finance.yahoo.com"
+
+    def get_info(self, symbol):
+        return yf.Ticker(symbol).info
+
+
+class ReplayProvider(QuoteProvider):
+    """
+    Proveedor sin red: responde desde un JSON {símbolo: info} grabado con
+    RecordingProvider (o armado a mano). Los símbolos que no están fallan con KeyError.
+    """
+
+    name = "replay"
+    host = "replay"
+    supports_bulk = True
+    rate_limited = False
+    offline = True
+
+    def __init__(self, path):
+        self.path = path
+        self._responses = None
+
+    @property
+    def responses(self):
+        if self._responses is None:
+            with open(self.path, encoding="utf-8") as f:
+                self._responses = json.load(f)
+        return self._responses
+
+    def get_info(self, symbol):
+        if symbol not in self.responses:
+            raise KeyError(f"{symbol}: sin respuesta grabada en {self.path}")
+        return self.responses[symbol]
+
+    def get_infos(self, symbols):
+        return {s: self.responses[s] for s in symbols if s in self.responses}
+
+
+class RecordingProvider(QuoteProvider):
+    """Envuelve otro proveedor y guarda cada respuesta en `path` para reproducirla con ReplayProvider."""
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.path = path
+        # Las respuestas grabadas son las reales del proveedor envuelto
+        self.name = inner.name
+        self.host = inner.host
+        self.supports_bulk = inner.supports_bulk
+        self.rate_limited = inner.rate_limited
+        self.offline = inner.offline
+        self._lock = threading.Lock()
+        self._responses = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._responses = json.load(f)
+
+    def _record(self, infos):
+        with self._lock:
+            self._responses.update(infos)
+            tmp_path = f"{self.path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._responses, f, default=str)
+            os.replace(tmp_path, self.path)
+
+    def get_info(self, symbol):
+        info = self.inner.get_info(symbol)
+        self._record({symbol: info})
+        return info
+
+    def get_infos(self, symbols):
+        infos = self.inner.get_infos(symbols)
+        self._record(infos)
+        return infos
+
+
+def get_provider(spec=None):
+    """
+    Proveedor según `spec` (o la variable QUOTE_PROVIDER): "yfinance",
+    "replay:<archivo.json>" o "record:<archivo.json>" (yfinance grabando las respuestas).
+    """
+    spec = spec or os.environ.get(QUOTE_PROVIDER_ENV, DEFAULT_PROVIDER)
+    kind, _, path = spec.partition(":")
+    if kind == "yfinance":
+        return YFinanceProvider()
+    if kind == "replay" and path:
+        return ReplayProvider(path)
+    if kind == "record" and path:
+        return RecordingProvider(YFinanceProvider(), path)
+    raise ValueError(f"Proveedor de cotizaciones desconocido: {spec!r}")
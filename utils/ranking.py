@@ -0,0 +1,37 @@
+import numpy as np
+
+
+def top_bottom_k(df, column, k=20):
+    """
+    Devuelve `(top, bottom)`: las `k` filas con mayor `column` (orden descendente)
+    y las `k` con menor (orden ascendente). Usa selección parcial (argpartition)
+    en lugar de ordenar todo el frame; los NaN se ignoran, como en `sort_values().head()`.
+    """
+    values = df[column].to_numpy(dtype=np.float64, na_value=np.nan)
+    valid = np.flatnonzero(~np.isnan(values))
+    k = max(0, min(int(k), len(valid)))
+    if k == 0:
+        return df.iloc[:0], df.iloc[:0]
+
+    valid_values = values[valid]
+    n = len(valid)
+    if n > 2 * k:
+        # Una sola partición deja los k menores al principio y los k mayores al final
+        part = np.argpartition(valid_values, (k - 1, n - k))
+        low, high = part[:k], part[n - k:]
+    else:
+        low = high = np.arange(n)
+
+    bottom = low[np.argsort(valid_values[low], kind="stable")][:k]
+    top = high[np.argsort(-valid_values[high], kind="stable")][:k]
+    return df.iloc[valid[top]], df.iloc[valid[bottom]]
+
+
+def top_k(df, column, k=20):
+    """Equivalente a `df.sort_values(column, ascending=False).head(k)`."""
+    return top_bottom_k(df, column, k)[0]
+
+
+def bottom_k(df, column, k=20):
+    """Equivalente a `df.sort_values(column, ascending=True).head(k)`."""
+    return top_bottom_k(df, column, k)[1]
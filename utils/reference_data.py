@@ -0,0 +1,204 @@
+import threading
+from collections import namedtuple
+from datetime import timedelta
+
+import pandas as pd
+
+from utils.market_data import MarketDataFetcher
+from utils.quote_cache import TickerCache
+from utils.quote_providers import get_provider
+
+REFERENCE_DATA_CACHE = "reference_data.parquet"
+# Cache de los proveedores offline (replay): sus respuestas nunca van al cache compartido
+REPLAY_DATA_CACHE = "reference_data.replay.parquet"
+
+# Campo del cache → (clave de `info` en Yahoo, dtype, vigencia)
+REFERENCE_FIELDS = {
+    "Market Cap": ("marketCap", "float64", timedelta(days=1)),
+    "Price": ("regularMarketPrice", "float64", timedelta(minutes=15)),
+    "Sector": ("sector", "object", timedelta(days=30)),
+    "Industry": ("industry", "object", timedelta(days=30)),
+}
+
+# Parámetros del fetch concurrente
+REFERENCE_WORKERS = 8
+REFERENCE_RATE_LIMIT = 5.0  # requests por segundo hacia Yahoo
+REFERENCE_RETRIES = 2
+REFERENCE_TIMEOUT = 10.0  # segundos por ticker
+
+# Refresco en segundo plano: campos que se mantienen calientes y cada cuánto se revisan
+PREFETCH_FIELDS = ["Price", "Market Cap"]
+PREFETCH_INTERVAL = 60.0  # segundos entre revisiones de vencimientos
+PREFETCH_CHUNK = 50  # tickers por tanda del barrido: cada tanda se guarda en el cache al terminar
+
+# Resultado de `lookup`: valor en cache (None si no hay), cuándo se obtuvo y si está vencido
+CachedValue = namedtuple("CachedValue", ["value", "fetched_at", "stale"])
+
+
+class PrefetchWorker:
+    """
+    Hilo daemon que mantiene vigentes `fields` para `tickers`: cada `interval` segundos
+    recorre los vencidos (ver `ReferenceData.refresh`) en tandas de `chunk_size`, y entre
+    tanda y tanda atiende los tickers pedidos con `request`. Los errores quedan en
+    `last_error` sin detener el hilo.
+    """
+
+    def __init__(self, reference, tickers, fields, interval, chunk_size=PREFETCH_CHUNK):
+        self.reference = reference
+        self.tickers = list(dict.fromkeys(tickers))
+        self.fields = list(fields)
+        self.interval = interval
+        self.chunk_size = max(1, int(chunk_size))
+        self.last_error = None
+        self._pending = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="reference-prefetch", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def add_tickers(self, tickers):
+        with self._lock:
+            self.tickers = list(dict.fromkeys(self.tickers + list(tickers)))
+
+    def request(self, tickers):
+        """Pide refrescar `tickers` en la próxima vuelta, sin esperar el resultado."""
+        with self._lock:
+            self._pending.update(tickers)
+        self._wake.set()
+
+    def _drain_pending(self):
+        """Refresca los tickers pedidos por las páginas desde la última tanda."""
+        with self._lock:
+            pending, self._pending = list(self._pending), set()
+        if pending:
+            self.reference.refresh(pending, self.fields)
+
+    def _sweep(self):
+        with self._lock:
+            tickers = self.tickers
+        stale = self.reference.cache.stale_tickers(tickers, columns=self.fields)
+        for start in range(0, len(stale), self.chunk_size):
+            # 🔹 Lo pedido por las páginas pasa antes que el resto del barrido
+            self._drain_pending()
+            # refresh vuelve a mirar el cache: salta lo que ya se refrescó a pedido
+            self.reference.refresh(stale[start:start + self.chunk_size], self.fields)
+        self._drain_pending()
+
+    def _run(self):
+        while True:
+            try:
+                self._sweep()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+
+class ReferenceData:
+    """
+    Datos de referencia por ticker (market cap, precio, sector, industria).
+
+    Un solo request de `info` por ticker (al `provider` dado o al de `get_provider()`)
+    trae todos los campos de REFERENCE_FIELDS
+    y se guarda en un TickerCache compartido con vigencia por campo. `refresh`
+    consulta solo los tickers con algún campo pedido vencido; `cached` y `lookup`
+    nunca hacen requests: las páginas usan `lookup` y el refresco lo hace el
+    worker de `start_prefetch`.
+
+    Cada entrada guarda como `source` el nombre del proveedor. Con un proveedor
+    offline el cache por defecto pasa a ser REPLAY_DATA_CACHE.
+    """
+
+    def __init__(self, path=REFERENCE_DATA_CACHE, fields=REFERENCE_FIELDS, fetcher=None, provider=None):
+        self.fields = fields
+        self._fetcher = fetcher
+        self.provider = fetcher.provider if fetcher is not None else (provider or get_provider())
+        if path == REFERENCE_DATA_CACHE and getattr(self.provider, "offline", False):
+            path = REPLAY_DATA_CACHE
+        self.cache = TickerCache(
+            path,
+            {name: dtype for name, (_, dtype, _) in fields.items()},
+            ttl={name: ttl for name, (_, _, ttl) in fields.items()},
+        )
+        self.worker = None
+        self._worker_lock = threading.Lock()
+
+    @property
+    def fetcher(self):
+        if self._fetcher is None:
+            self._fetcher = MarketDataFetcher(
+                provider=self.provider,
+                max_workers=REFERENCE_WORKERS,
+                requests_per_second=REFERENCE_RATE_LIMIT,
+                retries=REFERENCE_RETRIES,
+                timeout=REFERENCE_TIMEOUT,
+            )
+        return self._fetcher
+
+    def fetch(self, tickers):
+        """
+        Consulta todos los campos de `tickers` (un request por ticker), actualiza el cache
+        y devuelve `(rows, errors)`: {ticker: {campo: valor}} y {ticker: excepción} de los
+        que no respondieron.
+        """
+        tickers = list(dict.fromkeys(tickers))
+        infos, errors = self.fetcher.fetch_info_with_errors(tickers)
+        rows = {
+            ticker: {name: info.get(key) or None for name, (key, _, _) in self.fields.items()}
+            for ticker, info in infos.items()
+        }
+        source = getattr(self.provider, "name", None) or type(self.provider).__name__
+        # Un error (timeout, red) no es "sin datos": esos tickers conservan lo que tenían en cache
+        misses = [t for t in tickers if t not in rows and t not in errors]
+        self.cache.update(rows, misses=misses, source=source)
+        return rows, errors
+
+    def refresh(self, tickers, fields=None):
+        """
+        Consulta solo los tickers con alguno de `fields` (todos por defecto) vencido o faltante;
+        devuelve `(rows, errors)` como `fetch`.
+        """
+        stale = self.cache.stale_tickers(tickers, columns=fields or list(self.fields))
+        return self.fetch(stale) if stale else ({}, {})
+
+    def values(self, tickers, field):
+        """{ticker: valor} vigente de `field`, refrescando antes los tickers vencidos."""
+        tickers = list(tickers)
+        self.refresh(tickers, [field])
+        return self.cache.fresh_values(tickers, column=field)
+
+    def cached(self, tickers, field):
+        """{ticker: valor} vigente de `field` leído solo del cache (sin requests)."""
+        return self.cache.fresh_values(list(tickers), column=field)
+
+    def lookup(self, ticker, field):
+        """
+        Valor en cache de `field` para `ticker`, vigente o no, sin esperar a la red
+        (ver `CachedValue`). Si está vencido o falta, se lo pide al worker de prefetch.
+        """
+        entry = self.cache.entries([ticker], column=field).iloc[0]
+        value = entry[field]
+        if entry["stale"] and self.worker is not None:
+            self.worker.request([ticker])
+        return CachedValue(None if pd.isna(value) else value,
+                           None if pd.isna(entry["fetched_at"]) else entry["fetched_at"],
+                           bool(entry["stale"]))
+
+    def start_prefetch(self, tickers, fields=PREFETCH_FIELDS, interval=PREFETCH_INTERVAL):
+        """Arranca (una vez por proceso) el worker que mantiene calientes `fields` de `tickers`."""
+        with self._worker_lock:
+            if self.worker is not None and self.worker.is_alive():
+                self.worker.add_tickers(tickers)
+            else:
+                self.worker = PrefetchWorker(self, tickers, fields, interval).start()
+            return self.worker
+
+
+reference_data = ReferenceData()
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+# Columnas que pueden usarse como peso de cada posición
+SIMILARITY_WEIGHTS = ["Individual Holdings Value", "Percentage Owned"]
+SIMILARITY_METRICS = ["cosine", "jaccard"]
+
+
+class HolderSimilarity:
+    """
+    Matriz dispersa tenedor × ticker para buscar las carteras más parecidas a la de
+    un tenedor. Coseno usa los pesos de `weight_column`; Jaccard solo la presencia.
+    Sin filtro de fecha, los pesos de las distintas fechas de reporte se suman.
+    """
+
+    def __init__(self, df, weight_column="Individual Holdings Value"):
+        if weight_column not in SIMILARITY_WEIGHTS:
+            raise ValueError(f"Peso no soportado: {weight_column}")
+        holder_codes, holders = pd.factorize(df["Owner Name"], sort=True)
+        ticker_codes, tickers = pd.factorize(df["Ticker"], sort=True)
+        self.holders = np.asarray(holders, dtype=object)
+        self.tickers = np.asarray(tickers, dtype=object)
+        self._holder_ids = {name: i for i, name in enumerate(self.holders)}
+        shape = (len(self.holders), len(self.tickers))
+
+        # 🔹 coo → csr suma los duplicados (mismo tenedor y ticker en varias filas)
+        weights = np.nan_to_num(df[weight_column].to_numpy(dtype=np.float64, na_value=np.nan))
+        weights = np.clip(weights, 0, None)
+        weighted = sparse.coo_matrix((weights, (holder_codes, ticker_codes)), shape=shape).tocsr()
+        weighted.eliminate_zeros()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        self.normalized = sparse.diags(np.divide(1.0, norms, out=np.zeros_like(norms), where=norms > 0)) @ weighted
+
+        presence = sparse.coo_matrix((np.ones(len(holder_codes)), (holder_codes, ticker_codes)), shape=shape).tocsr()
+        presence.data[:] = 1.0
+        self.presence = presence
+        self.portfolio_sizes = np.diff(presence.indptr)
+
+    def scores(self, holder, metric="cosine"):
+        """Similitud de `holder` contra todos los tenedores (array alineado con `self.holders`)."""
+        i = self._holder_ids[holder]
+        if metric == "cosine":
+            return (self.normalized @ self.normalized[i].T).toarray().ravel()
+        if metric == "jaccard":
+            shared = self.common_tickers(holder)
+            union = self.portfolio_sizes + self.portfolio_sizes[i] - shared
+            return np.divide(shared, union, out=np.zeros(len(union)), where=union > 0)
+        raise ValueError(f"Métrica no soportada: {metric}")
+
+    def common_tickers(self, holder):
+        """Cantidad de tickers en común entre `holder` y cada tenedor."""
+        i = self._holder_ids[holder]
+        return (self.presence @ self.presence[i].T).toarray().ravel()
+
+    def neighbours(self, holder, metric="cosine", k=10):
+        """
+        Los `k` tenedores más parecidos a `holder` (sin incluirlo), ordenados por similitud.
+        Columnas: 'Owner Name', 'Similitud', 'Tickers en Común', 'Tickers en Cartera'.
+        """
+        if holder not in self._holder_ids:
+            return pd.DataFrame(columns=["Owner Name", "Similitud", "Tickers en Común", "Tickers en Cartera"])
+        scores = self.scores(holder, metric)
+        scores[self._holder_ids[holder]] = -np.inf
+        candidates = np.flatnonzero(scores > 0)
+        k = min(int(k), len(candidates))
+        if k < len(candidates):
+            candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return pd.DataFrame({
+            "Owner Name": self.holders[candidates],
+            "Similitud": scores[candidates],
+            "Tickers en Común": self.common_tickers(holder)[candidates].astype(np.int64),
+            "Tickers en Cartera": self.portfolio_sizes[candidates],
+        })